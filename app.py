@@ -1,26 +1,153 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, make_response, send_file, send_from_directory
 from flask_cors import CORS
 import os
+import math
+import re
+from functools import wraps
+from datetime import datetime
 from models.artisan import Artisan
 from models.product import Product
 from services.data_service import DataService 
 from services.file_service import FileService
+from services.image_pipeline import IMAGE_WRITERS
 from config import Config
 from services.google_cloud_service import GoogleCloudService
+from services.image_jobs import ImageJobQueue
+from services.thumbnail_cache import ThumbnailCache
+from services.facet_index import FacetIndex
+from services.catalog import SORT_FIELDS, SORT_KEY_TYPES
+from services.response_cache import ResponseCache
+from utils.helpers import get_timestamp, paginate, parse_fields, encode_cursor, decode_cursor
+from utils import serialization, compression
 
 
+serialization.use(Config.JSON_BACKEND)
+
 app = Flask(__name__)
 app.config.from_object(Config)
+app.json = serialization.JSONProvider(app)
 CORS(app)  
 
 # Services
 data = DataService()  
 files = FileService() 
 google_service = GoogleCloudService()
+responses = ResponseCache(Config.RESPONSE_CACHE_ENTRIES)
+thumbnails = ThumbnailCache(Config.RESIZE_CACHE_DIR, Config.RESIZE_CACHE_BYTES)
+image_jobs = ImageJobQueue(Config.IMAGE_WORKERS, Config.IMAGE_WORKER_START_METHOD,
+                           Config.IMAGE_JOB_HISTORY)
+# Placeholders for jobs that died with a previous run of the server
+data.drop_stale_pending_images(Config.PENDING_IMAGE_MAX_AGE)
+
+def response_encoding(size, mimetype):
+    """Content-coding to send a body of this size and type with, or None"""
+    if size < Config.COMPRESS_MIN_SIZE or mimetype not in Config.COMPRESS_MIMETYPES:
+        return None
+    return compression.negotiate(request.accept_encodings)
+
+def compress_body(body, encoding):
+    return compression.compress(body, encoding, Config.COMPRESS_GZIP_LEVEL,
+                                Config.COMPRESS_BROTLI_QUALITY)
+
+def cached_json(view):
+    """Serve a read endpoint from the response cache, with ETag revalidation.
+    
+    Successful bodies are stored encoded, keyed on the endpoint, its URL
+    arguments and the query string, for the current catalog generation;
+    any write moves the generation on and retires them. Every 200 carries a
+    strong ETag and a matching If-None-Match gets an empty 304 instead.
+    Compressed variants are cached on the same entry.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        generation = data.generation
+        key = (request.endpoint, tuple(sorted(kwargs.items())),
+               tuple(sorted(request.args.items(multi=True))))
+        
+        entry = responses.get(key, generation)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry = responses.put(key, generation, response.get_data(), response.mimetype)
+        
+        encoding = response_encoding(len(entry.body), entry.mimetype)
+        if encoding:
+            body, etag = entry.encoded(encoding, compress_body)
+        else:
+            body, etag = entry.body, entry.etag
+        
+        response = Response(body, mimetype=entry.mimetype)
+        response.set_etag(etag)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        # Let browsers keep the body but check back every time
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    return wrapper
+
+@app.after_request
+def compress_response(response):
+    """Compress any other sizeable text response the client can decode"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in Config.COMPRESS_MIMETYPES):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = response_encoding(len(body), response.mimetype)
+    if encoding:
+        response.set_data(compress_body(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+# Files under a content hash (originals and their renditions) never change
+CONTENT_ADDRESSED_UPLOAD = re.compile(r'images/[0-9a-f]{2}/[0-9a-f]{64}/[^/]+')
+
+def cache_forever(response):
+    """Let browsers and CDNs keep a response without revalidating"""
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = Config.IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory('uploads', filename)
+    # send_from_directory answers If-None-Match/If-Modified-Since with 304
+    # and Range with 206; other uploads stay no-cache so edits show up
+    response = send_from_directory(os.path.abspath(Config.UPLOAD_FOLDER), filename)
+    if CONTENT_ADDRESSED_UPLOAD.fullmatch(filename):
+        cache_forever(response)
+    return response
+
+@app.route('/images/<digest>')
+def resized_image(digest):
+    """A stored image at ?w= (an allowed width) in ?format=, rendered once and cached"""
+    width = request.args.get('w', type=int)
+    fmt = request.args.get('format', 'jpeg').lower().replace('jpg', 'jpeg')
+    
+    if width not in Config.RESIZE_WIDTHS:
+        allowed = ', '.join(str(w) for w in Config.RESIZE_WIDTHS)
+        return jsonify({'success': False, 'error': f'w must be one of: {allowed}'}), 400
+    if fmt not in files.formats:
+        allowed = ', '.join(files.formats)
+        return jsonify({'success': False, 'error': f'format must be one of: {allowed}'}), 400
+    if not files.images.exists(digest):
+        return jsonify({'success': False, 'error': 'Image not found'}), 404
+    
+    try:
+        path = thumbnails.get(f"{digest}-{width}.{IMAGE_WRITERS[fmt][1]}",
+                              lambda out: files.render_width(digest, width, fmt, out))
+    except OSError as e:
+        return jsonify({'success': False, 'error': f'Could not render image: {e}'}), 422
+    
+    return cache_forever(send_file(path, mimetype=f'image/{fmt}'))
 
 @app.route('/')
 def index():
@@ -40,6 +167,7 @@ def health_check():
     })
 
 @app.route('/api/dashboard')
+@cached_json
 def get_dashboard_stats():
     try:
         return jsonify({
@@ -49,6 +177,31 @@ def get_dashboard_stats():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def list_response(records, model_cls, **extra):
+    """JSON list body honoring ?fields=, ?limit= and ?cursor=.
+    
+    Without a limit every record is returned as before; with one, records are
+    ordered by (created_at, id) and next_cursor points at the following page.
+    Only the requested fields of the returned page are serialized. Any extra
+    keyword arguments are added to the body as-is.
+    """
+    fields = parse_fields(request.args.get('fields'), model_cls.FIELDS)
+    limit = request.args.get('limit', type=int)
+    body = {'success': True}
+    
+    if limit is not None:
+        if limit < 1:
+            raise ValueError('limit must be a positive integer')
+        
+        body['total'] = len(records)
+        records, body['next_cursor'] = paginate(records, min(limit, Config.MAX_PAGE_SIZE),
+                                                request.args.get('cursor'))
+    
+    body['data'] = [r.to_dict(fields) for r in records]
+    body['count'] = len(records)
+    body.update(extra)
+    return jsonify(body)
+
 # Artisan endpoints
 @app.route('/api/artisans')
 def get_artisans():
@@ -66,11 +219,9 @@ def get_artisans():
             result = [a for a in result if a.verified]
         
         # Return response
-        return jsonify({
-            'success': True,
-            'data': [a.to_dict() for a in result],
-            'count': len(result)
-        })
+        return list_response(result, Artisan)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -99,14 +250,19 @@ def create_artisan():
             if field not in req:
                 return jsonify({'success': False, 'error': f'Missing required field: {field}'}), 400
         
+        email = req['email']
+        if not isinstance(email, str) or not email.strip():
+            return jsonify({'success': False, 'error': 'email must be a non-empty string'}), 400
+        email = email.strip()
+        
         # Check if email already exists
-        if data.get_artisan_by_email(req['email']):
+        if data.email_registered(email):
             return jsonify({'success': False, 'error': 'Email already registered'}), 409
         
         # Create artisan object
         artisan = Artisan(
             name=req['name'],
-            email=req['email'],
+            email=email,
             phone=req['phone'],
             craft_type=req['craft_type'],
             location=req['location'],
@@ -120,6 +276,27 @@ def create_artisan():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def apply_artisan_updates(artisan, req):
+    """Copy the editable fields present in an update request onto artisan
+    (a DataService.edit_artisan edit)"""
+    if 'name' in req:
+        artisan.name = req['name']
+    if 'phone' in req:
+        artisan.phone = req['phone']
+    if 'craft_type' in req:
+        artisan.craft_type = req['craft_type']
+    if 'location' in req:
+        artisan.location = req['location']
+    if 'bio' in req:
+        artisan.bio = req['bio']
+    if 'experience_years' in req:
+        artisan.experience_years = int(req['experience_years'])
+    if 'verified' in req:
+        artisan.verified = bool(req['verified'])
+    if 'status' in req:
+        artisan.status = req['status']
+    return True
+
 @app.route('/api/artisans/<artisan_id>', methods=['PUT'])
 def update_artisan(artisan_id):
     try:
@@ -133,26 +310,10 @@ def update_artisan(artisan_id):
         if not req:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
         
-        # Update fields
-        if 'name' in req:
-            artisan.name = req['name']
-        if 'phone' in req:
-            artisan.phone = req['phone']
-        if 'craft_type' in req:
-            artisan.craft_type = req['craft_type']
-        if 'location' in req:
-            artisan.location = req['location']
-        if 'bio' in req:
-            artisan.bio = req['bio']
-        if 'experience_years' in req:
-            artisan.experience_years = int(req['experience_years'])
-        if 'verified' in req:
-            artisan.verified = bool(req['verified'])
-        if 'status' in req:
-            artisan.status = req['status']
-        
-        # Update in "database"
-        updated = data.update_artisan(artisan)
+        # Update in "database", on the stored record under the write lock
+        updated = data.edit_artisan(artisan_id, lambda a: apply_artisan_updates(a, req))
+        if not updated:
+            return jsonify({'success': False, 'error': 'Artisan not found'}), 404
         
         return jsonify({'success': True, 'data': updated.to_dict()})
     except Exception as e:
@@ -179,50 +340,120 @@ def upload_profile_image(artisan_id):
             return jsonify(result), 400
             
         # Update artisan with new image URL
-        artisan.profile_image = result['url']
-        data.update_artisan(artisan)
+        def set_profile_image(artisan):
+            artisan.profile_image = result['url']
+            return True
+        data.edit_artisan(artisan_id, set_profile_image)
         
         return jsonify(result)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # Product endpoints
+def product_filters():
+    """Facet filters from the query string; each facet takes comma-separated
+    or repeated values and matches any of them"""
+    filters = {}
+    for facet in ('category', 'artisan_id', 'material'):
+        values = [v.strip() for arg in request.args.getlist(facet) for v in arg.split(',') if v.strip()]
+        if values:
+            filters[facet] = values
+    
+    status = request.args.get('status', 'active')
+    if status != 'all':
+        filters['status'] = status.split(',')
+    if request.args.get('featured') == 'true':
+        filters['featured'] = ['true']
+    return filters
+
+def price_arg(name):
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        price = float(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a number')
+    # nan compares false with everything, so the filter would match it all
+    if not math.isfinite(price):
+        raise ValueError(f'{name} must be a number')
+    return price
+
 @app.route('/api/products')
+@cached_json
 def get_products():
     try:
         # Get filter params
-        category = request.args.get('category')
-        artisan_id = request.args.get('artisan_id')
         search = request.args.get('search')
-        featured = request.args.get('featured') == 'true'
-        status = request.args.get('status', 'active')
-        
-        # Get products based on primary filter
-        if search:
-            products = data.search_products(search)
-        elif category:
-            products = data.get_products_by_category(category)
-        elif artisan_id:
-            products = data.get_products_by_artisan(artisan_id)
-        else:
-            products = data.get_all_products()
-        
-        # Apply secondary filters
-        if featured:
-            products = [p for p in products if p.featured]
-        
-        if status != 'all':
-            products = [p for p in products if p.status == status]
-        
-        return jsonify({
+        sort = request.args.get('sort')
+        limit = request.args.get('limit', type=int)
+        filters = product_filters()
+        min_price = price_arg('min_price')
+        max_price = price_arg('max_price')
+        if limit is not None:
+            if limit < 1:
+                raise ValueError('limit must be a positive integer')
+            limit = min(limit, Config.MAX_PAGE_SIZE)
+        
+        # Relevance-ranked search: best matches first, cut to the top `limit`
+        if search and sort == 'relevance':
+            ranked = data.rank_products(search, limit, filters, min_price, max_price)
+            
+            fields = parse_fields(request.args.get('fields'), Product.FIELDS)
+            return jsonify({
+                'success': True,
+                'data': [dict(p.to_dict(fields), score=round(s, 4)) for p, s in ranked],
+                'count': len(ranked)
+            })
+        
+        # ?facets=true for every facet, or ?facets=category,material
+        facets = request.args.get('facets')
+        if facets == 'true':
+            facets = list(FacetIndex.FACETS)
+        elif facets:
+            facets = [f for f in facets.split(',') if f in FacetIndex.FACETS]
+        
+        # ?sort=price / -price (descending); paging needs an order, so
+        # ?limit= alone falls back to created_at as before
+        sort_field = sort.lstrip('-') if sort else None
+        if sort_field and sort_field not in SORT_FIELDS:
+            raise ValueError(f"sort must be one of: relevance, {', '.join(SORT_FIELDS)}")
+        if limit is not None:
+            sort = sort or 'created_at'
+        
+        after = None
+        cursor = request.args.get('cursor')
+        if cursor and limit is not None:
+            position = decode_cursor(cursor, (str, SORT_KEY_TYPES[sort.lstrip('-')], str))
+            if position[0] != sort:
+                raise ValueError('Invalid cursor')
+            after = position[1:]
+        
+        result = data.query_products(filters, search, min_price, max_price, facets,
+                                     sort_field, bool(sort and sort.startswith('-')),
+                                     limit, after)
+        
+        fields = parse_fields(request.args.get('fields'), Product.FIELDS)
+        products = result['products']
+        body = {
             'success': True,
-            'data': [p.to_dict() for p in products],
+            'data': [p.to_dict(fields) for p in products],
             'count': len(products)
-        })
+        }
+        if limit is not None:
+            body['total'] = result['total']
+            body['next_cursor'] = (encode_cursor((sort, *result['next_key']))
+                                   if result['next_key'] else None)
+        if result['facets'] is not None:
+            body['facets'] = result['facets']
+        return jsonify(body)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/products/<product_id>')
+@cached_json
 def get_product(product_id):
     try:
         product = data.get_product_by_id(product_id)
@@ -233,6 +464,53 @@ def get_product(product_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+PRODUCT_REQUIRED_FIELDS = ['artisan_id', 'name', 'description', 'price', 'category']
+
+def new_product_from(req):
+    """Build a Product from a create request body"""
+    return Product(
+        artisan_id=req['artisan_id'],
+        name=req['name'],
+        description=req['description'],
+        price=req['price'],
+        category=req['category'],
+        subcategory=req.get('subcategory'),
+        materials=req.get('materials', []),
+        dimensions=req.get('dimensions'),
+        weight=req.get('weight'),
+        stock_quantity=req.get('stock_quantity', 1)
+    )
+
+def apply_product_updates(product, req):
+    """Copy the editable fields present in an update request onto product.
+    Meant as a DataService.edit_product edit, so it always reports a change."""
+    if 'name' in req:
+        product.name = req['name']
+    if 'description' in req:
+        product.description = req['description']
+    if 'price' in req:
+        product.price = float(req['price'])
+    if 'category' in req:
+        product.category = req['category']
+    if 'subcategory' in req:
+        product.subcategory = req['subcategory']
+    if 'materials' in req:
+        product.materials = req['materials']
+    if 'dimensions' in req:
+        product.dimensions = req['dimensions']
+    if 'weight' in req:
+        product.weight = req['weight']
+    if 'stock_quantity' in req:
+        product.update_stock(int(req['stock_quantity']))
+    if 'status' in req:
+        product.status = req['status']
+    if 'featured' in req:
+        product.featured = bool(req['featured'])
+    if 'tags' in req:
+        product.tags = req['tags']
+    product.updated_at = get_timestamp()
+    return True
+
 @app.route('/api/products', methods=['POST'])
 def create_product():
     try:
@@ -242,28 +520,16 @@ def create_product():
             return jsonify({'success': False, 'error': 'No data provided'}), 400
             
         # Check required fields
-        required = ['artisan_id', 'name', 'description', 'price', 'category']
-        for field in required:
+        for field in PRODUCT_REQUIRED_FIELDS:
             if field not in req:
                 return jsonify({'success': False, 'error': f'Missing required field: {field}'}), 400
         
         # Check if artisan exists
-        if not data.get_artisan_by_id(req['artisan_id']):
+        if not data.artisan_exists(req['artisan_id']):
             return jsonify({'success': False, 'error': 'Artisan not found'}), 404
         
         # Create product object
-        product = Product(
-            artisan_id=req['artisan_id'],
-            name=req['name'],
-            description=req['description'],
-            price=req['price'],
-            category=req['category'],
-            subcategory=req.get('subcategory'),
-            materials=req.get('materials', []),
-            dimensions=req.get('dimensions'),
-            weight=req.get('weight'),
-            stock_quantity=req.get('stock_quantity', 1)
-        )
+        product = new_product_from(req)
         
         # Save to database
         data.create_product(product)
@@ -272,6 +538,85 @@ def create_product():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/products/bulk', methods=['POST'])
+def bulk_upsert_products():
+    """Create or update many products in one batch.
+    
+    Body is a JSON array or NDJSON (Content-Type: application/x-ndjson).
+    Rows with an existing 'id' update that product; rows without one are
+    created. An id may appear only once per batch: a later row with the
+    same id is reported as an error rather than merged over the first.
+    Bad rows are reported by index and skipped, the rest are saved
+    together with one write per collection.
+    """
+    try:
+        if request.mimetype == 'application/x-ndjson':
+            rows = []
+            for line in request.get_data().splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(serialization.loads(line))
+                except serialization.DecodeError as e:
+                    rows.append(ValueError(f'Invalid JSON: {e}'))
+        else:
+            rows = request.get_json(silent=True)
+            if not isinstance(rows, list):
+                return jsonify({'success': False, 'error': 'Expected a JSON array of products'}), 400
+        
+        if not rows:
+            return jsonify({'success': False, 'error': 'No data provided'}), 400
+        if len(rows) > Config.BULK_MAX_ROWS:
+            return jsonify({'success': False,
+                            'error': f'At most {Config.BULK_MAX_ROWS} rows per request'}), 400
+        
+        batch, edits, results, errors = [], {}, [], []
+        first_row = {}
+        for i, row in enumerate(rows):
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                if not isinstance(row, dict):
+                    raise ValueError('Row must be a JSON object')
+                
+                if row.get('id'):
+                    product = data.get_product_by_id(row['id'])
+                    if not product:
+                        raise ValueError('Product not found')
+                    if product.id in edits:
+                        raise ValueError(f'Duplicate id in batch (first in row {first_row[product.id]})')
+                    # Tried on a copy to catch bad values now; the save applies
+                    # it again to the stored record under the write lock
+                    apply_product_updates(product, row)
+                    edits[product.id] = lambda p, row=row: apply_product_updates(p, row)
+                    first_row[product.id] = i
+                    action = 'updated'
+                else:
+                    missing = [f for f in PRODUCT_REQUIRED_FIELDS if f not in row]
+                    if missing:
+                        raise ValueError(f"Missing required field: {', '.join(missing)}")
+                    if not data.artisan_exists(row['artisan_id']):
+                        raise ValueError('Artisan not found')
+                    product = new_product_from(row)
+                    batch.append(product)
+                    action = 'created'
+                
+                results.append({'row': i, 'id': product.id, 'action': action})
+            except (ValueError, TypeError) as e:
+                errors.append({'row': i, 'error': str(e)})
+        
+        data.save_products(batch, edits)
+        
+        return jsonify({
+            'success': True,
+            'created': sum(1 for r in results if r['action'] == 'created'),
+            'updated': sum(1 for r in results if r['action'] == 'updated'),
+            'results': results,
+            'errors': errors
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/products/<product_id>', methods=['PUT'])
 def update_product(product_id):
     try:
@@ -285,40 +630,45 @@ def update_product(product_id):
         if not req:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
         
-        # Update fields
-        if 'name' in req:
-            product.name = req['name']
-        if 'description' in req:
-            product.description = req['description']
-        if 'price' in req:
-            product.price = float(req['price'])
-        if 'category' in req:
-            product.category = req['category']
-        if 'subcategory' in req:
-            product.subcategory = req['subcategory']
-        if 'materials' in req:
-            product.materials = req['materials']
-        if 'dimensions' in req:
-            product.dimensions = req['dimensions']
-        if 'weight' in req:
-            product.weight = req['weight']
-        if 'stock_quantity' in req:
-            product.update_stock(int(req['stock_quantity']))
-        if 'status' in req:
-            product.status = req['status']
-        if 'featured' in req:
-            product.featured = bool(req['featured'])
-        if 'tags' in req:
-            product.tags = req['tags']
-        
-        updated = data.update_product(product)
+        # Update fields on the stored record under the write lock, so an
+        # image job finishing meanwhile isn't undone by this request's copy
+        updated = data.edit_product(product_id, lambda p: apply_product_updates(p, req))
+        if not updated:
+            return jsonify({'success': False, 'error': 'Product not found'}), 404
         
         return jsonify({'success': True, 'data': updated.to_dict()})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/products/<product_id>/images', methods=['POST'])
-def upload_product_image(product_id):
+# Image processing runs in the image worker pool; uploads get a job to poll
+def apply_image_job(job):
+    """Put a finished job's image in place of its pending entry (drop it on failure)"""
+    image = job['image'] if job['status'] == 'done' else None
+    data.resolve_product_image(job['product_id'], job['id'], image)
+
+def queue_image_job(product, kind, fn, *args, preview_url=None):
+    """Add a pending image entry to product and hand fn(*args) to the workers"""
+    job = image_jobs.new_job(kind, product.id)
+    # Added to the stored product, not this request's copy, so a job that
+    # finishes first isn't undone by saving the copy afterwards
+    data.add_pending_product_image(product.id, job['id'], preview_url)
+    
+    image_jobs.run(job, fn, *args, on_done=apply_image_job)
+    return image_jobs.get(job['id']) or job
+
+def image_job_response(job, **extra):
+    body = {
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': f"/api/image-jobs/{job['id']}"
+    }
+    body.update(extra)
+    return jsonify(body), 202
+
+def product_image_upload(product_id, store=None, rendition='product', **extra):
+    """Both image upload routes: keep the original now, render and store
+    its sizes in the background (files.store_local unless store is given)"""
     try:
         # Check if product exists
         product = data.get_product_by_id(product_id)
@@ -331,20 +681,62 @@ def upload_product_image(product_id):
             
         file = request.files['image']
         
-        # Upload and process image
-        result = files.upload_product_image(file, product_id)
+        result = files.save_product_upload(file, product_id, rendition)
         
         if not result['success']:
             return jsonify(result), 400
-            
-        # Add image URL to product
-        product.add_image(result['url'])
-        data.update_product(product)
         
-        return jsonify(result)
+        # Same bytes processed before: reuse that image as-is
+        if result['image']:
+            data.add_product_image(product_id, result['image'])
+            return jsonify({'success': True, 'duplicate': True, 'filename': result['filename'],
+                            'url': result['image']['url'], 'image': result['image'], **extra})
+        
+        job = queue_image_job(product, 'variants', files.process_product_image,
+                              result['digest'], store, rendition, preview_url=result['url'])
+        
+        return image_job_response(job, filename=result['filename'], url=result['url'], **extra)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/products/<product_id>/images', methods=['POST'])
+def upload_product_image(product_id):
+    return product_image_upload(product_id)
+
+@app.route('/api/image-jobs/<job_id>')
+def get_image_job(job_id):
+    """Status of an image upload job: pending, done (with the image) or failed"""
+    job = image_jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Image job not found'}), 404
+    
+    return jsonify({'success': True, 'data': job})
+
+# Export endpoints (NDJSON, one record per line, streamed)
+def ndjson_export(records):
+    since = request.args.get('since')
+    if since:
+        try:
+            datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'since must be an ISO timestamp'}), 400
+    
+    def generate():
+        for record in records(since):
+            yield serialization.dumps(record) + b'\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/export/products')
+def export_products():
+    """Every product as NDJSON; ?since=<updated_at> for incremental pulls"""
+    return ndjson_export(data.export_products)
+
+@app.route('/api/export/artisans')
+def export_artisans():
+    """Every artisan as NDJSON; ?since=<updated_at> for incremental pulls"""
+    return ndjson_export(data.export_artisans)
+
 @app.route('/api/enhance-description-preview', methods=['POST'])
 def enhance_description_preview():
     """Enhance description without saving to database (for inline preview)"""
@@ -377,6 +769,7 @@ def enhance_description_preview():
 
 # Utility endpoints
 @app.route('/api/categories')
+@cached_json
 def get_categories():
     try:
         categories = data.get_categories()
@@ -388,6 +781,7 @@ def get_categories():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/craft-types')
+@cached_json
 def get_craft_types():
     try:
         craft_types = data.get_craft_types()
@@ -400,26 +794,10 @@ def get_craft_types():
 @app.route('/api/products/<product_id>/images/enhanced', methods=['POST'])
 def upload_enhanced_product_image(product_id):
     """Upload product image with Google AI enhancement"""
-    try:
-        product = data.get_product_by_id(product_id)
-        if not product:
-            return jsonify({'success': False, 'error': 'Product not found'}), 404
-        if 'image' not in request.files:
-            return jsonify({'success': False, 'error': 'No image file provided'}), 400
-            
-        file = request.files['image']
-        
-        result = google_service.upload_product_image(file, product_id)
-        
-        if not result['success']:
-            return jsonify(result), 400
-            
-        product.add_image(result['url'])
-        data.update_product(product)
-        
-        return jsonify(result)
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    # Same processing as /images; the files go to Cloud Storage when it's set up
+    target = google_service.image_target
+    return product_image_upload(product_id, target, 'cloud' if target else 'product',
+                                enhanced=True, ai_enhanced=True)
 
 # Error handlers
 @app.errorhandler(404)
@@ -0,0 +1,123 @@
+"""CPU time and peak memory of the upload image processing paths.
+
+Writes large synthetic camera-style JPEGs (12 and 48 megapixels by
+default), then runs each processing path over them in a fresh process so
+its peak RSS can be read on its own:
+
+    variants  image_pipeline.render_variants (the product upload job, both routes)
+    resize    FileService.render_width at 320px (the /images/<digest> route)
+    profile   FileService.upload_profile_image
+    enhance   GoogleCloudService._enhance_image_with_ai (if google-cloud is installed)
+
+    python benchmarks/bench_images.py [--megapixels 12 48] [--repeat 3]
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from PIL import Image
+
+def sample_photo(path, megapixels, seed=7):
+    """A 4:3 JPEG with smooth gradients plus sensor-like noise"""
+    height = int((megapixels * 1_000_000 * 3 / 4) ** 0.5)
+    width = height * 4 // 3
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (height // 64 + 1, width // 64 + 1, 3), dtype=np.uint8)
+    base = Image.fromarray(small).resize((width, height), Image.Resampling.BILINEAR)
+    noise = rng.normal(0, 6, (height, width, 1)).astype(np.int16)
+    pixels = np.clip(np.asarray(base, dtype=np.int16) + noise, 0, 255).astype(np.uint8)
+    Image.fromarray(pixels).save(path, 'JPEG', quality=92)
+    return width, height
+
+def _rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def _run_case(case, image_path, workdir, repeat, queue):
+    """Runs in its own process: (cpu seconds per image, peak RSS growth in bytes)"""
+    from werkzeug.datastructures import FileStorage
+    from services.file_service import FileService
+    from services.image_pipeline import render_variants
+
+    files = FileService(os.path.join(workdir, case), index_path=os.path.join(workdir, f'{case}.db'))
+    with open(image_path, 'rb') as f:
+        content = f.read()
+    digest, _ = files.images.put(content, '.jpg', 'product:bench')
+    original = files.images.original_path(digest, '.jpg')
+
+    if case == 'variants':
+        work = lambda: render_variants(original, files.variants, files.formats)
+    elif case == 'resize':
+        work = lambda: files.render_width(digest, 320, 'jpeg', os.path.join(workdir, case, 'w320.jpg'))
+    elif case == 'profile':
+        work = lambda: files.upload_profile_image(FileStorage(io.BytesIO(content), 'photo.jpg'), 'bench')
+    else:
+        from services.google_cloud_service import GoogleCloudService
+        work = lambda: GoogleCloudService._enhance_image_with_ai(content)
+
+    baseline = _rss_bytes()
+    start = time.process_time()
+    for _ in range(repeat):
+        work()
+        if case == 'profile':
+            # Otherwise the rendition is reused after the first run
+            files.images.discard(digest)
+            files.images.put(content, '.jpg', 'product:bench')
+    cpu = (time.process_time() - start) / repeat
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    queue.put((cpu, peak - baseline))
+
+def _in_fresh_process(target, *args):
+    """Call target(*args, queue) in a spawned process and return what it puts.
+
+    ru_maxrss carries over from the forking process, so this process never
+    touches big images itself; the peak each case reports is its own.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=target, args=args + (queue,))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def _write_sample(path, megapixels, queue):
+    queue.put(sample_photo(path, megapixels))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--megapixels', type=int, nargs='+', default=[12, 48])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cases = ['variants', 'resize', 'profile']
+    try:
+        import google.cloud.storage  # noqa: F401
+        cases.append('enhance')
+    except ImportError:
+        pass
+
+    workdir = tempfile.mkdtemp(prefix='bench_images_')
+    try:
+        for megapixels in args.megapixels:
+            image_path = os.path.join(workdir, f'{megapixels}mp.jpg')
+            width, height = _in_fresh_process(_write_sample, image_path, megapixels)
+            size_mb = os.path.getsize(image_path) / 2 ** 20
+            print(f"{megapixels} MP sample ({width}x{height}, {size_mb:.1f} MiB JPEG)")
+            for case in cases:
+                cpu, peak = _in_fresh_process(_run_case, case, image_path, workdir, args.repeat)
+                print(f"  {case:<9} {cpu * 1000:8.0f} ms CPU/image   peak RSS +{peak / 2 ** 20:6.1f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
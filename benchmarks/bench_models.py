@@ -0,0 +1,95 @@
+"""Hydration time and memory for the Product/Artisan models.
+
+Builds a synthetic catalog (100k products by default), then times
+Product.from_dict over all of it and measures the memory the hydrated
+objects hold with tracemalloc.
+
+    python benchmarks/bench_models.py [--products 100000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.artisan import Artisan
+from models.product import Product
+from utils.helpers import generate_id, get_timestamp
+
+CATEGORIES = ['Home Decor', 'Kitchen', 'Jewelry', 'Clothing', 'Pottery', 'Textiles']
+MATERIALS = ['Clay', 'Teak wood', 'Cotton', 'Silk', 'Brass', 'Natural dye', 'Silver']
+
+def synthetic_products(n, n_artisans=2000, seed=7):
+    rng = random.Random(seed)
+    artisan_ids = [generate_id() for _ in range(n_artisans)]
+    stamp = get_timestamp()
+    return [{
+        'id': generate_id(),
+        'artisan_id': rng.choice(artisan_ids),
+        'name': f'Handmade item {i}',
+        'description': 'Handcrafted by a traditional artisan using natural materials. ' * 2,
+        'price': round(rng.uniform(100, 20000), 2),
+        'category': rng.choice(CATEGORIES),
+        'subcategory': None,
+        'materials': rng.sample(MATERIALS, 2),
+        'dimensions': {'length': 30, 'width': 20},
+        'weight': 0.8,
+        'stock_quantity': rng.randint(0, 20),
+        'images': [],
+        'created_at': stamp,
+        'updated_at': stamp,
+        'status': 'active',
+        'tags': ['handmade'],
+        'featured': rng.random() < 0.1
+    } for i in range(n)]
+
+def synthetic_artisans(n):
+    stamp = get_timestamp()
+    return [{
+        'id': generate_id(), 'name': f'Artisan {i}', 'email': f'artisan{i}@example.com',
+        'phone': '9876543210', 'craft_type': 'Pottery',
+        'location': {'city': 'Jaipur', 'state': 'Rajasthan'}, 'bio': None,
+        'experience_years': 10, 'profile_image': None, 'created_at': stamp,
+        'updated_at': stamp, 'status': 'active', 'verified': False, 'rating': 4.0,
+        'total_products': 0, 'total_orders': 0
+    } for i in range(n)]
+
+def time_hydration(cls, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        [cls.from_dict(row) for row in rows]
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def memory_of(cls, rows):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls.from_dict(row) for row in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return after - before
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--artisans', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    products = synthetic_products(args.products)
+    artisans = synthetic_artisans(args.artisans)
+
+    for cls, rows in ((Product, products), (Artisan, artisans)):
+        seconds = time_hydration(cls, rows, args.repeat)
+        size = memory_of(cls, rows)
+        print(f"{cls.__name__:8} x{len(rows):>7}: from_dict {seconds * 1000:8.1f} ms "
+              f"({seconds / len(rows) * 1e6:5.2f} us/record), "
+              f"held {size / 1024 / 1024:7.1f} MiB ({size / len(rows):6.0f} B/record)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Encode/decode throughput of the JSON backends on a products file.
+
+For each installed backend (see utils/serialization.py) this encodes a
+synthetic products list compactly and pretty-printed (as the snapshots
+are written), then decodes it back, at 10k and 100k records.
+
+    python benchmarks/bench_serialization.py [--sizes 10000 100000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_models import synthetic_products
+from utils import serialization
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        rows = synthetic_products(n)
+        print(f"{n} products")
+        for name in serialization.PREFERENCE:
+            if name not in serialization.BACKENDS:
+                print(f"  {name:8} not installed")
+                continue
+            serialization.use(name)
+            compact = serialization.dumps(rows)
+            pretty = serialization.dumps(rows, pretty=True)
+            mb = len(compact) / 1024 / 1024
+
+            encode = best_of(args.repeat, lambda: serialization.dumps(rows))
+            encode_pretty = best_of(args.repeat, lambda: serialization.dumps(rows, pretty=True))
+            decode = best_of(args.repeat, lambda: serialization.loads(compact))
+            print(f"  {name:8} encode {encode * 1000:7.1f} ms ({mb / encode:6.1f} MB/s)  "
+                  f"pretty {encode_pretty * 1000:7.1f} ms  "
+                  f"decode {decode * 1000:7.1f} ms ({mb / decode:6.1f} MB/s)  "
+                  f"size {mb:5.1f} MB compact / {len(pretty) / 1024 / 1024:5.1f} MB pretty")
+
+if __name__ == '__main__':
+    main()
@@ -9,9 +9,72 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    # Product uploads keep the original and get each of these sizes (max
+    # width, max height) rendered for <img srcset>, in every format below
+    # that the encoder profile includes and that suits the image
+    IMAGE_VARIANTS = {'thumb': (200, 200), 'card': (480, 480), 'detail': (1200, 1200)}
+    # format -> encoder quality; AVIF needs Pillow 11.2+ or pillow-avif-plugin
+    IMAGE_FORMATS = {'jpeg': 85, 'webp': 80, 'avif': 60}
+    # Encoder settings per format. 'fast' keeps upload CPU low; 'max' spends
+    # more of it (and adds AVIF variants) for smaller files and less egress.
+    # A format missing from the active profile isn't rendered.
+    IMAGE_ENCODER_PROFILE = os.environ.get('IMAGE_ENCODER_PROFILE', 'fast')
+    IMAGE_ENCODER_PROFILES = {
+        'fast': {
+            'jpeg': {'progressive': True},
+            'webp': {'method': 2},
+        },
+        'max': {
+            'jpeg': {'optimize': True, 'progressive': True},
+            'webp': {'method': 6},
+            'avif': {'speed': 4},
+        },
+    }
+    # Uploads bigger than this are refused from their header, before decoding
+    MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 64_000_000))
+    # /images/<digest>?w=&format= renders these widths on demand into a
+    # disk cache that drops its least recently used files past the size limit
+    RESIZE_WIDTHS = (120, 200, 320, 480, 640, 800, 1200)
+    RESIZE_CACHE_DIR = os.path.join(UPLOAD_FOLDER, 'cache')
+    RESIZE_CACHE_BYTES = int(os.environ.get('RESIZE_CACHE_BYTES', 256 * 1024 * 1024))
+    # Processes for image resizing/encoding/uploads (0 runs them in the request);
+    # start method None uses the platform default (fork, spawn or forkserver)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    IMAGE_WORKER_START_METHOD = os.environ.get('IMAGE_WORKER_START_METHOD') or None
+    IMAGE_JOB_HISTORY = 1000
+    # Pending image entries older than this at startup belong to jobs lost
+    # with a previous process and are removed
+    PENDING_IMAGE_MAX_AGE = 60 * 60
+    # Browser cache lifetime for URLs whose content can never change
+    # (content-addressed uploads, resized images, fingerprinted static files)
+    IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+    MAX_PAGE_SIZE = 100
+    BULK_MAX_ROWS = 5000
+    # Encoded GET responses kept per catalog generation (0 disables the cache)
+    RESPONSE_CACHE_ENTRIES = int(os.environ.get('RESPONSE_CACHE_ENTRIES', 256))
+    # Responses of these types at least COMPRESS_MIN_SIZE bytes are sent
+    # brotli- (if installed) or gzip-encoded when the client accepts it
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/html',
+                          'text/css', 'text/plain', 'application/javascript'}
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
     DATA_DIR = 'data'
     ARTISANS_FILE = os.path.join(DATA_DIR, 'artisans.json')
     PRODUCTS_FILE = os.path.join(DATA_DIR, 'products.json')
+    # 'json' keeps the files above, 'sqlite' uses SQLITE_PATH
+    # (run `python -m services.storage` once to migrate the JSON files)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(DATA_DIR, 'kala_kaksh.db'))
+    # Refcounts and renditions of uploaded images; kept out of UPLOAD_FOLDER,
+    # which is served as-is
+    IMAGE_INDEX_PATH = os.environ.get('IMAGE_INDEX_PATH', os.path.join(DATA_DIR, 'images.db'))
+    # With the JSON backend, append changes to data/changes.log and fold them
+    # into the snapshots in the background once the log passes this size
+    JSON_WRITE_LOG = os.environ.get('JSON_WRITE_LOG', 'True').lower() == 'true'
+    JSON_LOG_COMPACT_BYTES = int(os.environ.get('JSON_LOG_COMPACT_BYTES', 1024 * 1024))
+    # JSON encoder: 'orjson', 'msgspec' or 'json'; unset uses the fastest installed
+    JSON_BACKEND = os.environ.get('JSON_BACKEND') or None
     GOOGLE_CLOUD_PROJECT = os.environ.get('GOOGLE_CLOUD_PROJECT', 'kala-kaksh-hackathon')
     GOOGLE_CLOUD_BUCKET = os.environ.get('GOOGLE_CLOUD_BUCKET', 'kala-kaksh-images')
     GOOGLE_APPLICATION_CREDENTIALS = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
@@ -1,12 +1,19 @@
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
 import os
+import sys
+
+# static_caching.py is shared with appf.py one folder up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from static_caching import init_static_caching
 
 app = Flask(__name__, 
             template_folder='../templates',
             static_folder='../static')
 CORS(app)
 
+init_static_caching(app)
+
 # Mock data to simulate a product database
 productCatalog = {
     "saree": [
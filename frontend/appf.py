@@ -3,11 +3,33 @@ from flask_cors import CORS
 import vertexai
 from vertexai.preview.vision_models import ImageGenerationModel
 import base64
+import gzip
 import os
+from static_caching import init_static_caching
 
 app = Flask(__name__)
 CORS(app)  # This will enable cross-origin requests
 
+# Gzip JSON/HTML responses at least this big (the generated image data URIs are ~1MB)
+GZIP_MIN_SIZE = 1024
+GZIP_MIMETYPES = {'application/json', 'text/html', 'text/css', 'application/javascript'}
+
+@app.after_request
+def gzip_response(response):
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in GZIP_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) >= GZIP_MIN_SIZE and request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+init_static_caching(app)
+
 # Replace with your Google Cloud Project ID and location
 PROJECT_ID = "dark-geography-472317-i7"
 LOCATION = "asia-south1"
@@ -0,0 +1,45 @@
+"""Content-hash fingerprints and long-lived caching for a Flask app's static files.
+
+url_for('static', ...) links carry ?v=<content hash>, so a changed file
+gets a new URL and versioned requests can be cached for a year.
+"""
+from functools import lru_cache
+import hashlib
+import os
+
+from flask import request
+
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+@lru_cache(maxsize=256)
+def _static_hash(path, mtime):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+def static_version(app, filename):
+    path = os.path.join(app.static_folder, filename)
+    try:
+        return _static_hash(path, os.path.getmtime(path))
+    except OSError:
+        return None
+
+def init_static_caching(app):
+    """Register the fingerprinting and caching hooks on app"""
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and 'v' not in values:
+            version = static_version(app, values.get('filename', ''))
+            if version:
+                values['v'] = version
+
+    @app.after_request
+    def cache_static(response):
+        # Unversioned or stale ?v= requests keep Flask's no-cache + ETag revalidation
+        version = request.args.get('v')
+        if (request.endpoint == 'static' and version
+                and version == static_version(app, request.view_args.get('filename', ''))):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
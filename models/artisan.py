@@ -1,6 +1,14 @@
 from utils.helpers import generate_id, get_timestamp
 
 class Artisan:
+    # Everything to_dict() returns, in order; also the allowed ?fields= values
+    FIELDS = ('id', 'name', 'email', 'phone', 'craft_type', 'location', 'bio',
+              'experience_years', 'profile_image', 'created_at', 'updated_at',
+              'status', 'verified', 'rating', 'total_products', 'total_orders')
+    
+    # No per-instance __dict__: every artisan is held in memory
+    __slots__ = FIELDS
+    
     def __init__(self, name, email, phone, craft_type, location, 
                  bio=None, experience_years=0):
         # Basic info
@@ -23,7 +31,11 @@ class Artisan:
         self.total_products = 0
         self.total_orders = 0
         
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        """Serialize to a dict; pass field names to only build those keys"""
+        if fields is not None:
+            return {f: getattr(self, f) for f in fields}
+        
         return {
             'id': self.id,
             'name': self.name,
@@ -45,19 +57,21 @@ class Artisan:
     
     @classmethod
     def from_dict(cls, data):
-        artisan = cls(
-            name=data['name'],
-            email=data['email'],
-            phone=data['phone'],
-            craft_type=data['craft_type'],
-            location=data['location'],
-            bio=data.get('bio'),
-            experience_years=data.get('experience_years', 0)
-        )
+        """Rebuild a stored artisan as-is, skipping __init__'s id and timestamp generation"""
+        artisan = cls.__new__(cls)
         artisan.id = data['id']
+        artisan.name = data['name']
+        artisan.email = data['email']
+        artisan.phone = data['phone']
+        artisan.craft_type = data['craft_type']
+        artisan.location = data['location']
+        artisan.bio = data.get('bio')
+        experience_years = data.get('experience_years', 0)
+        artisan.experience_years = int(experience_years) if experience_years else 0
+        
         artisan.profile_image = data.get('profile_image')
         artisan.created_at = data['created_at']
-        artisan.updated_at = data.get('updated_at', get_timestamp())
+        artisan.updated_at = data['updated_at'] if 'updated_at' in data else get_timestamp()
         artisan.status = data.get('status', 'active')
         artisan.verified = data.get('verified', False)
         artisan.rating = data.get('rating', 0.0)
@@ -65,12 +79,21 @@ class Artisan:
         artisan.total_orders = data.get('total_orders', 0)
         return artisan
     
+    def copy(self):
+        """Detached copy that can be edited without touching the original"""
+        artisan = Artisan.__new__(Artisan)
+        for name in Artisan.__slots__:
+            setattr(artisan, name, getattr(self, name))
+        if isinstance(self.location, dict):
+            artisan.location = dict(self.location)
+        return artisan
+    
     def update_rating(self, new_rating):
         self.rating = round(float(new_rating), 1)
         self.updated_at = get_timestamp()
     
-    def increment_products(self):
-        self.total_products += 1
+    def increment_products(self, count=1):
+        self.total_products += count
         self.updated_at = get_timestamp()
     
     def increment_orders(self):
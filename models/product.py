@@ -1,6 +1,14 @@
 from utils.helpers import generate_id, get_timestamp
 
 class Product:
+    # Everything to_dict() returns, in order; also the allowed ?fields= values
+    FIELDS = ('id', 'artisan_id', 'name', 'description', 'price', 'category',
+              'subcategory', 'materials', 'dimensions', 'weight', 'stock_quantity',
+              'images', 'created_at', 'updated_at', 'status', 'tags', 'featured')
+    
+    # No per-instance __dict__: the whole catalog is held in memory
+    __slots__ = FIELDS
+    
     def __init__(self, artisan_id, name, description, price, category, 
                  subcategory=None, materials=None, dimensions=None, 
                  weight=None, stock_quantity=1, images=None):
@@ -26,7 +34,11 @@ class Product:
         self.tags = []
         self.featured = False
         
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        """Serialize to a dict; pass field names to only build those keys"""
+        if fields is not None:
+            return {f: getattr(self, f) for f in fields}
+        
         return {
             'id': self.id,
             'artisan_id': self.artisan_id,
@@ -49,29 +61,42 @@ class Product:
     
     @classmethod
     def from_dict(cls, data):
-        product = cls(
-            artisan_id=data['artisan_id'],
-            name=data['name'],
-            description=data['description'],
-            price=data['price'],
-            category=data['category'],
-            subcategory=data.get('subcategory'),
-            materials=data.get('materials', []),
-            dimensions=data.get('dimensions'),
-            weight=data.get('weight'),
-            stock_quantity=data.get('stock_quantity', 1),
-            images=data.get('images', [])
-        )
-        
+        """Rebuild a stored product as-is, skipping __init__'s id and timestamp generation"""
+        product = cls.__new__(cls)
         product.id = data['id']
+        product.artisan_id = data['artisan_id']
+        product.name = data['name']
+        product.description = data['description']
+        product.price = float(data['price'])
+        product.category = data['category']
+        product.subcategory = data.get('subcategory')
+        
+        product.materials = data.get('materials') or []
+        product.dimensions = data.get('dimensions')
+        product.weight = data.get('weight')
+        product.stock_quantity = int(data.get('stock_quantity', 1))
+        
+        product.images = data.get('images') or []
         product.created_at = data['created_at']
-        product.updated_at = data.get('updated_at', get_timestamp())
+        product.updated_at = data['updated_at'] if 'updated_at' in data else get_timestamp()
         product.status = data.get('status', 'active')
         product.tags = data.get('tags', [])
         product.featured = data.get('featured', False)
         
         return product
     
+    def copy(self):
+        """Detached copy that can be edited without touching the original"""
+        product = Product.__new__(Product)
+        for name in Product.__slots__:
+            setattr(product, name, getattr(self, name))
+        product.materials = list(self.materials)
+        product.images = list(self.images)
+        product.tags = list(self.tags)
+        if isinstance(self.dimensions, dict):
+            product.dimensions = dict(self.dimensions)
+        return product
+    
     def update_stock(self, quantity):
         """Update stock and automatically change status if needed"""
         self.stock_quantity = max(0, quantity)
@@ -83,20 +108,57 @@ class Product:
             
         self.updated_at = get_timestamp()
         
-    def add_image(self, image_url):
-        """Add an image URL if it's not already in the list"""
-        if image_url and image_url not in self.images:
-            self.images.append(image_url)
+    @staticmethod
+    def image_url(image):
+        """URL of an images entry: a plain URL string, or a variants dict's 'url'"""
+        return image.get('url') if isinstance(image, dict) else image
+    
+    def add_image(self, image):
+        """Add an image (URL or variants dict) if its URL isn't already in the list"""
+        url = self.image_url(image)
+        if url and url not in [self.image_url(i) for i in self.images]:
+            self.images.append(image)
             self.updated_at = get_timestamp()
             return True
         return False
     
     def remove_image(self, image_url):
-        """Remove an image URL from the list"""
-        if image_url in self.images:
-            self.images.remove(image_url)
-            self.updated_at = get_timestamp()
-            return True
+        """Remove the image with this URL from the list"""
+        for image in self.images:
+            if self.image_url(image) == image_url:
+                self.images.remove(image)
+                self.updated_at = get_timestamp()
+                return True
+        return False
+    
+    def add_pending_image(self, job_id, preview_url=None):
+        """Placeholder entry for an image still being processed by job_id"""
+        self.updated_at = get_timestamp()
+        self.images.append({'job_id': job_id, 'status': 'pending', 'url': preview_url,
+                            'queued_at': self.updated_at})
+        return True
+    
+    def drop_pending_images(self, queued_before):
+        """Remove placeholders queued before this timestamp (or with no queue time)"""
+        kept = [i for i in self.images
+                if not (isinstance(i, dict) and i.get('status') == 'pending'
+                        and i.get('queued_at', '') < queued_before)]
+        if len(kept) == len(self.images):
+            return False
+        self.images = kept
+        self.updated_at = get_timestamp()
+        return True
+    
+    def resolve_image(self, job_id, image=None):
+        """Swap job_id's placeholder for the finished image, or drop it if image is None"""
+        for i, entry in enumerate(self.images):
+            if isinstance(entry, dict) and entry.get('job_id') == job_id:
+                if image is None:
+                    del self.images[i]
+                else:
+                    self.images[i] = image
+                self.updated_at = get_timestamp()
+                return True
         return False
     
     def toggle_featured(self):
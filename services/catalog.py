@@ -0,0 +1,245 @@
+from collections import Counter
+from typing import Dict, List, Optional, Iterable, Tuple
+from models.artisan import Artisan
+from models.product import Product
+from services.search_index import SearchIndex
+from services.facet_index import FacetIndex, bit_positions, popcount
+from services.sorted_index import SortedIndex
+
+def _index_add(index, key, record_id):
+    index.setdefault(key, {})[record_id] = None
+
+def _index_remove(index, key, record_id):
+    ids = index.get(key)
+    if ids is not None:
+        ids.pop(record_id, None)
+        if not ids:
+            del index[key]
+
+def _count_remove(counter, key):
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
+
+# Orderings kept as sorted indexes; rating is the product's artisan's rating
+SORT_FIELDS = ('price', 'created_at', 'updated_at', 'rating')
+# Type of each ordering's keys (what a paging cursor must hold)
+SORT_KEY_TYPES = {'price': float, 'created_at': str, 'updated_at': str, 'rating': float}
+
+class Catalog:
+    """In-memory copy of every artisan and product, keyed by id.
+
+    Records are kept in insertion order so listings come back in the same
+    order as the backing files. Callers get detached copies so edits made
+    before an update_* call never leak into the shared state.
+
+    Secondary indexes map a key to an insertion-ordered dict of ids (used as
+    an ordered set) and are kept in step by put_artisan/put_product, along
+    with the running counts behind the dashboard.
+    """
+
+    def __init__(self):
+        self.artisans: Dict[str, Artisan] = {}
+        self.products: Dict[str, Product] = {}
+
+        self.artisan_by_email: Dict[str, str] = {}
+        self.products_by_artisan: Dict[str, Dict[str, None]] = {}
+        self.products_by_category: Dict[str, Dict[str, None]] = {}
+        self.products_by_status: Dict[str, Dict[str, None]] = {}
+        self.search = SearchIndex()
+        self.facets = FacetIndex()
+        self.sorted: Dict[str, SortedIndex] = {name: SortedIndex() for name in SORT_FIELDS}
+
+        # Dashboard aggregates
+        self.verified_artisans = 0
+        self.craft_type_counts: Counter = Counter()
+        self.category_counts: Counter = Counter()
+
+    def load(self, artisan_rows: Iterable[dict], product_rows: Iterable[dict]):
+        """Replace everything with freshly parsed rows"""
+        self.__init__()
+        for row in artisan_rows:
+            self.put_artisan(Artisan.from_dict(row))
+        for row in product_rows:
+            self._put_product(Product.from_dict(row))
+
+        # Build the bitmaps and sorted indexes in bulk rather than per record
+        self.facets.add_many(self.products.values())
+        for name, index in self.sorted.items():
+            index.build((pid, self._sort_key(name, p)) for pid, p in self.products.items())
+
+    def apply(self, artisan_rows: Iterable[dict], product_rows: Iterable[dict]):
+        """Fold rows written elsewhere into the catalog one record at a time"""
+        for row in artisan_rows:
+            self.put_artisan(Artisan.from_dict(row))
+        for row in product_rows:
+            self.put_product(Product.from_dict(row))
+
+    # Artisans
+    def put_artisan(self, artisan: Artisan):
+        old = self.artisans.get(artisan.id)
+        if old is not None:
+            if old.email and self.artisan_by_email.get(old.email.lower()) == old.id:
+                del self.artisan_by_email[old.email.lower()]
+            self.verified_artisans -= bool(old.verified)
+            _count_remove(self.craft_type_counts, old.craft_type)
+
+        self.artisans[artisan.id] = artisan.copy()
+        if artisan.email:
+            self.artisan_by_email[artisan.email.lower()] = artisan.id
+        self.verified_artisans += bool(artisan.verified)
+        self.craft_type_counts[artisan.craft_type] += 1
+
+        if old is not None and old.rating != artisan.rating:
+            rating = self.sorted['rating']
+            for pid in self.products_by_artisan.get(artisan.id, ()):
+                rating.add(pid, float(artisan.rating or 0.0))
+
+    def get_artisan(self, artisan_id: str) -> Optional[Artisan]:
+        artisan = self.artisans.get(artisan_id)
+        return artisan.copy() if artisan else None
+
+    def get_artisan_by_email(self, email: str) -> Optional[Artisan]:
+        artisan_id = self.artisan_by_email.get(email.lower()) if email else None
+        return self.get_artisan(artisan_id) if artisan_id else None
+
+    def all_artisans(self) -> List[Artisan]:
+        return [a.copy() for a in self.artisans.values()]
+
+    # Products
+    def put_product(self, product: Product):
+        self._put_product(product)
+        self.facets.add(product)
+        for name, index in self.sorted.items():
+            index.add(product.id, self._sort_key(name, product))
+
+    def _sort_key(self, name: str, product: Product):
+        if name == 'price':
+            return float(product.price)
+        if name == 'rating':
+            artisan = self.artisans.get(product.artisan_id)
+            return float(artisan.rating or 0.0) if artisan else 0.0
+        return getattr(product, name) or ''
+
+    def _put_product(self, product: Product):
+        """Everything put_product does except the bitmaps and sorted indexes"""
+        old = self.products.get(product.id)
+        if old is not None:
+            _index_remove(self.products_by_artisan, old.artisan_id, old.id)
+            _index_remove(self.products_by_category, old.category.lower(), old.id)
+            _index_remove(self.products_by_status, old.status, old.id)
+            _count_remove(self.category_counts, old.category)
+
+        self.products[product.id] = product.copy()
+        _index_add(self.products_by_artisan, product.artisan_id, product.id)
+        _index_add(self.products_by_category, product.category.lower(), product.id)
+        _index_add(self.products_by_status, product.status, product.id)
+        self.category_counts[product.category] += 1
+        self.search.add(product)
+
+    def get_product(self, product_id: str) -> Optional[Product]:
+        product = self.products.get(product_id)
+        return product.copy() if product else None
+
+    def get_products(self, product_ids: Iterable[str]) -> List[Product]:
+        """Copies of the given products, skipping ids that don't exist"""
+        products = self.products
+        return [products[pid].copy() for pid in product_ids if pid in products]
+
+    def all_products(self) -> List[Product]:
+        return [p.copy() for p in self.products.values()]
+
+    def products_for_artisan(self, artisan_id: str) -> List[Product]:
+        return self.get_products(self.products_by_artisan.get(artisan_id, ()))
+
+    def products_in_category(self, category: str) -> List[Product]:
+        return self.get_products(self.products_by_category.get(category.lower(), ()))
+
+    def products_with_status(self, status: str) -> List[Product]:
+        return self.get_products(self.products_by_status.get(status, ()))
+
+    def search_products(self, query: str) -> List[Product]:
+        return self.get_products(self.search.search(query))
+
+    # Combined queries
+    def _price_bits(self, min_price: Optional[float], max_price: Optional[float]) -> int:
+        return self.facets.bits_for_ids(self.sorted['price'].range(min_price, max_price))
+
+    def _base_bits(self, search: Optional[str], min_price: Optional[float],
+                   max_price: Optional[float]) -> Optional[int]:
+        """Bitmap for the non-facet constraints, or None if there are none"""
+        base = None
+        if search:
+            base = self.facets.bits_for_ids(self.search.match(search))
+        if min_price is not None or max_price is not None:
+            price = self._price_bits(min_price, max_price)
+            base = price if base is None else base & price
+        return base
+
+    def query_products(self, filters: Dict[str, List[str]], search: Optional[str] = None,
+                       min_price: Optional[float] = None, max_price: Optional[float] = None,
+                       facets: Optional[Iterable[str]] = None, sort: Optional[str] = None,
+                       descending: bool = False, limit: Optional[int] = None,
+                       after: Optional[tuple] = None) -> Dict:
+        """Run a combined query.
+
+        Returns {'products', 'total', 'next_key', 'facets'}. Without sort and
+        limit products come back in catalog order. With a sort, products are
+        read off that sorted index in order, skipping non-matches, so a page
+        costs a bisect plus the entries walked rather than sorting every hit;
+        when under a quarter of the catalog matches, the hits are sorted instead.
+        ``after``/``next_key`` are (sort key, id) positions for paging.
+        """
+        base = self._base_bits(search, min_price, max_price)
+        bits = self.facets.filter(filters, base)
+        result = {
+            'total': popcount(bits),
+            'next_key': None,
+            'facets': self.facets.counts(filters, base, facets) if facets else None,
+        }
+
+        if sort is None and limit is None:
+            result['products'] = self.get_products(self.facets.ids_for_bits(bits))
+            return result
+
+        index = self.sorted[sort or 'created_at']
+        if result['total'] < len(index) // 4:
+            # Few hits, paged or not: sorting them is cheaper than walking
+            # the index past every non-match
+            keys = index.keys
+            entries = [(keys[pid], pid) for pid in self.facets.ids_for_bits(bits)]
+            if after is not None:
+                after = tuple(after)
+                entries = [e for e in entries if (e < after if descending else e > after)]
+            entries.sort(reverse=descending)
+            if limit is not None and len(entries) > limit:
+                result['next_key'] = entries[limit - 1]
+                entries = entries[:limit]
+            result['products'] = self.get_products([pid for _, pid in entries])
+            return result
+
+        everything = bits == self.facets.all_docs
+        members = None if everything else {self.facets.doc_ids[pos] for pos in bit_positions(bits)}
+        ids = []
+        for entry in index.walk(descending, after):
+            if members is not None and entry[1] not in members:
+                continue
+            if limit is not None and len(ids) == limit:
+                result['next_key'] = (last_key, ids[-1])
+                break
+            ids.append(entry[1])
+            last_key = entry[0]
+
+        result['products'] = self.get_products(ids)
+        return result
+
+    def rank_products(self, query: str, limit: Optional[int] = None,
+                      filters: Optional[Dict[str, List[str]]] = None,
+                      min_price: Optional[float] = None,
+                      max_price: Optional[float] = None) -> List[Tuple[Product, float]]:
+        within = None
+        if filters or min_price is not None or max_price is not None:
+            base = self._base_bits(query, min_price, max_price)
+            within = set(self.facets.ids_for_bits(self.facets.filter(filters or {}, base)))
+        return [(self.products[pid].copy(), score)
+                for pid, score in self.search.rank(query, limit, within)]
@@ -1,131 +1,349 @@
-import os
-import json
-from typing import List, Optional, Dict, Any
+import threading
+from datetime import datetime, timedelta
+from collections import Counter
+from typing import List, Optional, Dict, Any, Iterator, Tuple
+from config import Config
 from models.artisan import Artisan
 from models.product import Product
-from utils.helpers import save_json_data, load_json_data
+from services.catalog import Catalog
+from services.storage import StorageBackend, create_storage
+from utils.helpers import get_timestamp
 
 class DataService:
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", storage: Optional[StorageBackend] = None):
         self.data_dir = data_dir
-        self.artisans_file = os.path.join(data_dir, "artisans.json")
-        self.products_file = os.path.join(data_dir, "products.json")
+        self.storage = storage or create_storage(Config.STORAGE_BACKEND, data_dir,
+                                                 Config.SQLITE_PATH,
+                                                 write_log=Config.JSON_WRITE_LOG,
+                                                 compact_bytes=Config.JSON_LOG_COMPACT_BYTES)
         
-        os.makedirs(data_dir, exist_ok=True)
-        
-        if not os.path.exists(self.artisans_file):
-            save_json_data([], self.artisans_file)
+        # Parsed once and kept hot; reloaded only when the store changes underneath us
+        self._catalog = Catalog()
+        self._stamp = None
+        # Where the storage's changes_since() picks up; None forces a full load
+        self._position = None
+        self._lock = threading.RLock()
+        # Bumped on every change to the catalog, ours or another process's
+        self._generation = 0
+    
+    # Cache handling
+    def _ensure_fresh(self) -> Catalog:
+        """Return the catalog, catching up if the store was changed by someone else.
         
-        if not os.path.exists(self.products_file):
-            save_json_data([], self.products_file)
+        Only the rows written since the last look are applied when the
+        storage can list them; a full rebuild is left for the first load,
+        compactions and anything else changes_since() can't follow.
+        """
+        with self._lock:
+            stamp = self.storage.stamp()
+            if stamp != self._stamp:
+                changes = None
+                if self._position is not None:
+                    changes = self.storage.changes_since(self._position)
+                if changes is None:
+                    artisans, products, self._position = self.storage.load_all()
+                    self._catalog.load(artisans, products)
+                else:
+                    artisans, products, self._position = changes
+                    self._catalog.apply(artisans, products)
+                self._stamp = stamp
+                self._generation += 1
+            return self._catalog
+    
+    def _save(self, save, changed, snapshot):
+        self._generation += 1
+        try:
+            save(changed, snapshot)
+        except Exception:
+            # The catalog already holds the change but the store doesn't;
+            # forget the stamp so the next read reloads what was really saved
+            self._stamp = None
+            self._position = None
+            raise
+        self._stamp = self.storage.stamp()
+    
+    def _save_artisans(self, *artisans: Artisan):
+        catalog = self._catalog
+        self._save(self.storage.save_artisans, [a.to_dict() for a in artisans],
+                   lambda: [a.to_dict() for a in catalog.artisans.values()])
+    
+    def _save_products(self, *products: Product):
+        catalog = self._catalog
+        self._save(self.storage.save_products, [p.to_dict() for p in products],
+                   lambda: [p.to_dict() for p in catalog.products.values()])
+    
+    @property
+    def generation(self) -> int:
+        """Counter that changes whenever the catalog does (for response caching)"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._generation
+    
+    def reload(self):
+        """Drop the cached catalog so the next read goes back to disk"""
+        with self._lock:
+            self._stamp = None
+            self._position = None
     
     # Artisan methods
     def get_all_artisans(self) -> List[Artisan]:
-        data = load_json_data(self.artisans_file)
-        return [Artisan.from_dict(item) for item in data]
+        with self._lock:
+            return self._ensure_fresh().all_artisans()
     
     def get_artisan_by_id(self, artisan_id: str) -> Optional[Artisan]:
-        for artisan in self.get_all_artisans():
-            if artisan.id == artisan_id:
-                return artisan
-        return None
+        with self._lock:
+            return self._ensure_fresh().get_artisan(artisan_id)
     
     def get_artisan_by_email(self, email: str) -> Optional[Artisan]:
-        for artisan in self.get_all_artisans():
-            if artisan.email == email:
-                return artisan
-        return None
+        with self._lock:
+            return self._ensure_fresh().get_artisan_by_email(email)
     
     def create_artisan(self, artisan: Artisan) -> Artisan:
-        artisans = load_json_data(self.artisans_file)
-        artisans.append(artisan.to_dict())
-        save_json_data(artisans, self.artisans_file)
+        with self._lock, self.storage.write_lock():
+            self._ensure_fresh().put_artisan(artisan)
+            self._save_artisans(artisan)
         return artisan
     
     def update_artisan(self, artisan: Artisan) -> Optional[Artisan]:
-        artisans = load_json_data(self.artisans_file)
-        
-        for i, item in enumerate(artisans):
-            if item['id'] == artisan.id:
-                artisans[i] = artisan.to_dict()
-                save_json_data(artisans, self.artisans_file)
-                return artisan
-        
-        return None  
+        with self._lock, self.storage.write_lock():
+            catalog = self._ensure_fresh()
+            if artisan.id not in catalog.artisans:
+                return None
+            
+            # Every edit counts for ?since= exports, whichever route made it
+            artisan.updated_at = get_timestamp()
+            catalog.put_artisan(artisan)
+            self._save_artisans(artisan)
+            return artisan
+    
+    def edit_artisan(self, artisan_id: str, edit) -> Optional[Artisan]:
+        """Apply edit(artisan) to the stored artisan and save it in one locked
+        step, like edit_product, so counts bumped meanwhile (total_products
+        from create_product) aren't overwritten by a stale copy"""
+        with self._lock, self.storage.write_lock():
+            artisan = self._ensure_fresh().get_artisan(artisan_id)
+            if artisan is None or not edit(artisan):
+                return None
+            return self.update_artisan(artisan)
     
     # Product methods
     def get_all_products(self) -> List[Product]:
-        data = load_json_data(self.products_file)
-        return [Product.from_dict(item) for item in data]
+        with self._lock:
+            return self._ensure_fresh().all_products()
     
     def get_product_by_id(self, product_id: str) -> Optional[Product]:
-        for product in self.get_all_products():
-            if product.id == product_id:
-                return product
-        return None
+        with self._lock:
+            return self._ensure_fresh().get_product(product_id)
     
     def get_products_by_artisan(self, artisan_id: str) -> List[Product]:
-        return [p for p in self.get_all_products() if p.artisan_id == artisan_id]
+        with self._lock:
+            return self._ensure_fresh().products_for_artisan(artisan_id)
     
     def get_products_by_category(self, category: str) -> List[Product]:
-        return [p for p in self.get_all_products() if p.category.lower() == category.lower()]
+        with self._lock:
+            return self._ensure_fresh().products_in_category(category)
+    
+    def get_products_by_status(self, status: str) -> List[Product]:
+        with self._lock:
+            return self._ensure_fresh().products_with_status(status)
+    
+    def artisan_exists(self, artisan_id: str) -> bool:
+        with self._lock:
+            return artisan_id in self._ensure_fresh().artisans
+    
+    def email_registered(self, email: str) -> bool:
+        with self._lock:
+            return email.lower() in self._ensure_fresh().artisan_by_email
     
     def search_products(self, query: str) -> List[Product]:
-        query = query.lower()
-        results = []
-        
-        for product in self.get_all_products():
-            # Check name, description, materials
-            if (query in product.name.lower() or 
-                query in product.description.lower() or
-                any(query in m.lower() for m in product.materials)):
-                results.append(product)
+        """Products whose name, description, materials or tags contain every
+        word of the query; each word also matches as a prefix (type-ahead)"""
+        with self._lock:
+            return self._ensure_fresh().search_products(query)
+    
+    def rank_products(self, query: str, limit: Optional[int] = None,
+                      filters: Optional[Dict[str, List[str]]] = None,
+                      min_price: Optional[float] = None,
+                      max_price: Optional[float] = None) -> List[Tuple[Product, float]]:
+        """Same matches as search_products, as (product, BM25 score) best first"""
+        with self._lock:
+            return self._ensure_fresh().rank_products(query, limit, filters, min_price, max_price)
+    
+    def query_products(self, filters: Dict[str, List[str]], search: Optional[str] = None,
+                       min_price: Optional[float] = None, max_price: Optional[float] = None,
+                       facets: Optional[List[str]] = None, sort: Optional[str] = None,
+                       descending: bool = False, limit: Optional[int] = None,
+                       after: Optional[tuple] = None) -> Dict[str, Any]:
+        """Products matching any combination of facet filters, search and price range.
         
-        return results
+        filters maps a facet (category, artisan_id, status, featured, material)
+        to the accepted values. sort is one of price, created_at, updated_at or
+        rating; limit/after page through that order. Returns a dict with
+        'products', 'total', 'next_key' and 'facets' (counts only for the
+        facets asked for).
+        """
+        with self._lock:
+            return self._ensure_fresh().query_products(filters, search, min_price, max_price,
+                                                       facets, sort, descending, limit, after)
     
     def create_product(self, product: Product) -> Product:
-        products = load_json_data(self.products_file)
-        products.append(product.to_dict())
-        save_json_data(products, self.products_file)
-        
-        # Update artisan's product count
-        artisan = self.get_artisan_by_id(product.artisan_id)
-        if artisan:
-            artisan.increment_products()
-            self.update_artisan(artisan)
+        with self._lock, self.storage.write_lock():
+            catalog = self._ensure_fresh()
+            catalog.put_product(product)
+            self._save_products(product)
+            
+            # Update artisan's product count
+            artisan = catalog.get_artisan(product.artisan_id)
+            if artisan:
+                artisan.increment_products()
+                self.update_artisan(artisan)
         
         return product
     
     def update_product(self, product: Product) -> Optional[Product]:
-        products = load_json_data(self.products_file)
+        with self._lock, self.storage.write_lock():
+            catalog = self._ensure_fresh()
+            if product.id not in catalog.products:
+                return None
+            
+            catalog.put_product(product)
+            self._save_products(product)
+            return product
+    
+    def edit_product(self, product_id: str, edit) -> Optional[Product]:
+        """Apply edit(product) to the stored product and save it, in one
+        locked step so a concurrent image job or update can't be overwritten
+        by a stale copy. edit returns False when there was nothing to change;
+        None if the product doesn't exist (or nothing changed)."""
+        with self._lock, self.storage.write_lock():
+            catalog = self._ensure_fresh()
+            product = catalog.get_product(product_id)
+            if product is None or not edit(product):
+                return None
+            
+            catalog.put_product(product)
+            self._save_products(product)
+            return product
+    
+    def add_product_image(self, product_id: str, image) -> Optional[Product]:
+        return self.edit_product(product_id, lambda p: p.add_image(image))
+    
+    def add_pending_product_image(self, product_id: str, job_id: str,
+                                  preview_url: Optional[str] = None) -> Optional[Product]:
+        return self.edit_product(product_id, lambda p: p.add_pending_image(job_id, preview_url))
+    
+    def resolve_product_image(self, product_id: str, job_id: str,
+                              image=None) -> Optional[Product]:
+        """Replace (or with image=None, remove) a pending image entry in one locked step"""
+        return self.edit_product(product_id, lambda p: p.resolve_image(job_id, image))
+    
+    def drop_stale_pending_images(self, max_age: float) -> int:
+        """Remove pending image entries queued over max_age seconds ago.
         
-        for i, item in enumerate(products):
-            if item['id'] == product.id:
-                products[i] = product.to_dict()
-                save_json_data(products, self.products_file)
-                return product
+        Image jobs only live in the memory of the process that queued them,
+        so after a restart their placeholders would stay pending forever.
+        Returns the number of products changed.
+        """
+        queued_before = (datetime.now() - timedelta(seconds=max_age)).isoformat()
+        with self._lock, self.storage.write_lock():
+            catalog = self._ensure_fresh()
+            changed = [p for p in catalog.all_products() if p.drop_pending_images(queued_before)]
+            for product in changed:
+                catalog.put_product(product)
+            if changed:
+                self._save_products(*changed)
+            return len(changed)
+    
+    # Export
+    def export_artisans(self, since: Optional[str] = None) -> Iterator[dict]:
+        """Yield artisan dicts one at a time, optionally only those updated after since"""
+        if self.storage.streams_reads:
+            yield from self.storage.find_artisans(updated_since=since)
+            return
         
-        return None  
+        # Records in the catalog are replaced, never edited in place, so a
+        # list of references is a consistent snapshot to serialize lazily
+        with self._lock:
+            artisans = list(self._ensure_fresh().artisans.values())
+        for artisan in artisans:
+            if since is None or artisan.updated_at > since:
+                yield artisan.to_dict()
+    
+    def export_products(self, since: Optional[str] = None) -> Iterator[dict]:
+        """Yield product dicts one at a time, optionally only those updated after since"""
+        if self.storage.streams_reads:
+            yield from self.storage.find_products(updated_since=since)
+            return
+        
+        with self._lock:
+            products = list(self._ensure_fresh().products.values())
+        for product in products:
+            if since is None or product.updated_at > since:
+                yield product.to_dict()
+    
+    def save_products(self, products: List[Product],
+                      edits: Optional[Dict[str, Any]] = None) -> List[Product]:
+        """Create or update many products at once.
+        
+        edits maps product ids to edit(product) callables, applied to the
+        stored products under the write lock as edit_product() does; ids
+        that don't exist are skipped. Each artisan's total_products is
+        bumped once by the number of new products, and everything is
+        persisted with one write per collection.
+        """
+        if not products and not edits:
+            return []
+        
+        with self._lock, self.storage.write_lock():
+            catalog = self._ensure_fresh()
+            
+            products = list(products)
+            for product_id, edit in (edits or {}).items():
+                product = catalog.get_product(product_id)
+                if product is not None:
+                    edit(product)
+                    products.append(product)
+            
+            new_per_artisan = Counter()
+            for product in products:
+                if product.id not in catalog.products:
+                    new_per_artisan[product.artisan_id] += 1
+                catalog.put_product(product)
+            
+            artisans = []
+            for artisan_id, count in new_per_artisan.items():
+                artisan = catalog.get_artisan(artisan_id)
+                if artisan:
+                    artisan.increment_products(count)
+                    catalog.put_artisan(artisan)
+                    artisans.append(artisan)
+            
+            self._save_products(*products)
+            if artisans:
+                self._save_artisans(*artisans)
+        
+        return products
     
     def get_categories(self) -> List[str]:
-        products = self.get_all_products()
-        categories = set(p.category for p in products)
-        return sorted(list(categories))
+        with self._lock:
+            return sorted(self._ensure_fresh().category_counts)
     
     def get_craft_types(self) -> List[str]:
-        artisans = self.get_all_artisans()
-        craft_types = set(a.craft_type for a in artisans)
-        return sorted(list(craft_types))
+        with self._lock:
+            return sorted(self._ensure_fresh().craft_type_counts)
     
     def get_dashboard_stats(self) -> Dict[str, Any]:
-        artisans = self.get_all_artisans()
-        products = self.get_all_products()
-        
-        return {
-            'total_artisans': len(artisans),
-            'total_products': len(products),
-            'verified_artisans': sum(1 for a in artisans if a.verified),
-            'active_products': sum(1 for p in products if p.status == 'active'),
-            'categories': self.get_categories(),
-            'craft_types': self.get_craft_types()
-        }
\ No newline at end of file
+        """Built from counters the catalog keeps up to date on every write"""
+        with self._lock:
+            catalog = self._ensure_fresh()
+            
+            return {
+                'total_artisans': len(catalog.artisans),
+                'total_products': len(catalog.products),
+                'verified_artisans': catalog.verified_artisans,
+                'active_products': len(catalog.products_by_status.get('active', ())),
+                'categories': sorted(catalog.category_counts),
+                'craft_types': sorted(catalog.craft_type_counts),
+                'category_counts': dict(catalog.category_counts),
+                'craft_type_counts': dict(catalog.craft_type_counts)
+            }
\ No newline at end of file
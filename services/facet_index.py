@@ -0,0 +1,171 @@
+from typing import Dict, Iterable, List, Optional
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(bits: int) -> int:
+        return bin(bits).count('1')
+
+def bit_positions(bits: int, limit: Optional[int] = None) -> List[int]:
+    """Positions of the set bits, lowest first (optionally only the first limit)"""
+    positions = []
+    if not bits:
+        return positions
+    # One pass over the binary string beats peeling bits off a big int
+    digits = bin(bits)[:1:-1]
+    pos = digits.find('1')
+    while pos != -1:
+        positions.append(pos)
+        if limit is not None and len(positions) >= limit:
+            break
+        pos = digits.find('1', pos + 1)
+    return positions
+
+class FacetIndex:
+    """Per-facet bitmaps over products for combined filters and facet counts.
+
+    Every product gets a fixed doc number the first time it is added; each
+    facet value maps to a Python int used as a bitmap of doc numbers. A
+    filter is an AND across facets of the OR of the selected values, and a
+    facet count is a popcount of an AND, so both stay cheap however many
+    filters are combined.
+    """
+
+    FACETS = ('category', 'artisan_id', 'status', 'featured', 'material')
+
+    def __init__(self):
+        self.doc_ids: List[str] = []
+        self.doc_numbers: Dict[str, int] = {}
+        self.all_docs = 0
+        self.bitmaps: Dict[str, Dict[str, int]] = {f: {} for f in self.FACETS}
+        # Display form of case-folded values (category, material)
+        self.labels: Dict[str, Dict[str, str]] = {f: {} for f in self.FACETS}
+        self._doc_values: Dict[int, Dict[str, List[str]]] = {}
+
+    @staticmethod
+    def facet_values(product) -> Dict[str, List[str]]:
+        return {
+            'category': [product.category],
+            'artisan_id': [product.artisan_id],
+            'status': [product.status],
+            'featured': ['true' if product.featured else 'false'],
+            'material': list(dict.fromkeys(m for m in product.materials if m)),
+        }
+
+    @staticmethod
+    def normalize(value) -> str:
+        return str(value).strip().lower()
+
+    def add(self, product):
+        doc = self.doc_numbers.get(product.id)
+        if doc is None:
+            doc = len(self.doc_ids)
+            self.doc_ids.append(product.id)
+            self.doc_numbers[product.id] = doc
+        else:
+            self._clear(doc)
+
+        bit = 1 << doc
+        values = self.facet_values(product)
+        self._doc_values[doc] = values
+        for facet, facet_values in values.items():
+            bitmaps = self.bitmaps[facet]
+            for value in facet_values:
+                key = self.normalize(value)
+                bitmaps[key] = bitmaps.get(key, 0) | bit
+                self.labels[facet][key] = value
+        self.all_docs |= bit
+
+    def add_many(self, products):
+        """Index many new products at once, building each bitmap in one go.
+
+        OR-ing bits into a growing int one doc at a time costs O(catalog)
+        per add; collecting positions first and packing them keeps a full
+        load linear.
+        """
+        positions: Dict[str, Dict[str, List[int]]] = {f: {} for f in self.FACETS}
+        for product in products:
+            if product.id in self.doc_numbers:
+                self.add(product)
+                continue
+            doc = len(self.doc_ids)
+            self.doc_ids.append(product.id)
+            self.doc_numbers[product.id] = doc
+
+            values = self.facet_values(product)
+            self._doc_values[doc] = values
+            for facet, facet_values in values.items():
+                for value in facet_values:
+                    key = self.normalize(value)
+                    positions[facet].setdefault(key, []).append(doc)
+                    self.labels[facet][key] = value
+
+        for facet, by_key in positions.items():
+            bitmaps = self.bitmaps[facet]
+            for key, docs in by_key.items():
+                bitmaps[key] = bitmaps.get(key, 0) | self._pack(docs)
+        self.all_docs = self._pack(range(len(self.doc_ids))) if self.doc_ids else 0
+
+    def _pack(self, docs: Iterable[int]) -> int:
+        buf = bytearray(len(self.doc_ids) // 8 + 1)
+        for doc in docs:
+            buf[doc >> 3] |= 1 << (doc & 7)
+        return int.from_bytes(buf, 'little')
+
+    def _clear(self, doc: int):
+        bit = 1 << doc
+        for facet, facet_values in self._doc_values.pop(doc, {}).items():
+            bitmaps = self.bitmaps[facet]
+            for value in facet_values:
+                key = self.normalize(value)
+                remaining = bitmaps.get(key, 0) & ~bit
+                if remaining:
+                    bitmaps[key] = remaining
+                else:
+                    bitmaps.pop(key, None)
+                    self.labels[facet].pop(key, None)
+        self.all_docs &= ~bit
+
+    def bits_for_ids(self, ids: Iterable[str]) -> int:
+        numbers = self.doc_numbers
+        return self._pack(numbers[doc_id] for doc_id in ids if doc_id in numbers)
+
+    def ids_for_bits(self, bits: int, limit: Optional[int] = None) -> List[str]:
+        doc_ids = self.doc_ids
+        return [doc_ids[pos] for pos in bit_positions(bits, limit)]
+
+    def _facet_bits(self, facet: str, values: Iterable[str]) -> int:
+        bitmaps = self.bitmaps[facet]
+        bits = 0
+        for value in values:
+            bits |= bitmaps.get(self.normalize(value), 0)
+        return bits
+
+    def filter(self, filters: Dict[str, List[str]], base: Optional[int] = None) -> int:
+        """Bitmap of docs matching every facet in filters (any listed value per facet)"""
+        bits = self.all_docs if base is None else base & self.all_docs
+        for facet, values in filters.items():
+            if not bits:
+                break
+            bits &= self._facet_bits(facet, values)
+        return bits
+
+    def counts(self, filters: Dict[str, List[str]], base: Optional[int] = None,
+               facets: Iterable[str] = FACETS) -> Dict[str, Dict[str, int]]:
+        """Per-value hit counts for each facet.
+
+        A facet's own selection is left out when counting it, so the counts
+        show how many results each alternative value would give.
+        """
+        result = {}
+        for facet in facets:
+            others = {f: v for f, v in filters.items() if f != facet}
+            bits = self.filter(others, base)
+            labels = self.labels[facet]
+            counts = {}
+            for key, value_bits in self.bitmaps[facet].items():
+                n = popcount(bits & value_bits)
+                if n:
+                    counts[labels[key]] = n
+            result[facet] = counts
+        return result
@@ -1,15 +1,23 @@
 import os
-import uuid
 import shutil
-from PIL import Image
 from werkzeug.utils import secure_filename
 from utils.helpers import allowed_file
+from services.image_store import ImageStore
+from services.image_pipeline import (IMAGE_WRITERS, check_image, output_formats,
+                                     render_variants, render_one)
+from config import Config
 
 class FileService:
-    def __init__(self, upload_dir="uploads"):
+    def __init__(self, upload_dir="uploads", variants=None, formats=None, index_path=None):
         self.upload_dir = upload_dir
         self.product_images_dir = os.path.join(upload_dir, "products")
         self.profile_images_dir = os.path.join(upload_dir, "profiles")
+        self.variants = variants or Config.IMAGE_VARIANTS
+        # format -> quality; by default what the encoder profile renders
+        self.formats = formats or output_formats()
+        # Uploads are stored once per distinct content, shared by every owner
+        self.images = ImageStore(os.path.join(upload_dir, "images"),
+                                 index_path or Config.IMAGE_INDEX_PATH, url_prefix="uploads/images")
         
         self._create_directories()
     
@@ -23,81 +31,175 @@ class FileService:
             if not os.path.exists(gitkeep):
                 open(gitkeep, 'w').close()
     
-    def _generate_unique_filename(self, original_filename):
-        """Create unique filename to avoid conflicts"""
-        _, ext = os.path.splitext(original_filename)
+    def store_local(self, digest, filename, content, fmt):
+        """Default storage target: write a rendition next to its original"""
+        with open(os.path.join(self.images.blob_dir(digest), filename), 'wb') as f:
+            f.write(content)
+        return f"{self.images.url_dir(digest)}/{filename}"
+    
+    def render_width(self, digest, width, fmt, output_path):
+        """Render a stored original at most width pixels wide (never upscaled)"""
+        record = self.images.get(digest)
+        if record is None:
+            raise FileNotFoundError(f'No stored image {digest}')
+        
+        content, _ = render_one(self.images.original_path(digest, record['ext']),
+                                (width, None), self.formats, fmt)
+        with open(output_path, 'wb') as f:
+            f.write(content)
+    
+    def _image_entry(self, original_url, width, height, variants):
+        """Product.images entry: original, per-size URLs and ready-made srcsets"""
+        entry = {
+            'original': original_url,
+            'width': width,
+            'height': height,
+            'variants': variants,
+            'srcset': {}
+        }
+        # Formats chosen for this image's content, in configured order
+        formats = [fmt for fmt in self.formats if any(fmt in v for v in variants.values())]
         
-        unique_name = str(uuid.uuid4())
+        by_width = sorted(variants.values(), key=lambda v: v['width'])
+        for fmt in formats:
+            # dict.fromkeys: sizes sharing a file are listed once
+            entry['srcset'][fmt] = ', '.join(dict.fromkeys(f"{v[fmt]} {v['width']}w" for v in by_width))
         
-        return secure_filename(f"{unique_name}{ext}")
+        # Plain src for clients that ignore srcset: the largest size, first format
+        largest = by_width[-1] if by_width else {}
+        entry['url'] = next((largest[fmt] for fmt in formats if fmt in largest),
+                            entry['original'])
+        return entry
     
-    def _resize_image(self, image_path, max_width=800, max_height=600, quality=85):
-        """Make images smaller and web-friendly"""
+    def _read_upload(self, file, type_error):
+        """(content, extension) of an uploaded image, or an error result dict"""
+        if not file or file.filename == '':
+            return {'success': False, 'error': 'No file selected'}
+        
+        if not allowed_file(file.filename):
+            return {'success': False, 'error': type_error}
+        
+        _, ext = os.path.splitext(secure_filename(file.filename))
+        content = file.read()
+        # Header-only check, so oversized and non-image files never get stored
         try:
-            with Image.open(image_path) as img:
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-                
-                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-                
-                img.save(image_path, 'JPEG', quality=quality, optimize=True)
-                
-        except Exception as e:
-            print(f"Couldn't resize image {image_path}: {e}")
+            check_image(content)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        return content, ext.lower()
     
-    def upload_product_image(self, file, product_id):
-        """Handle product image upload and processing"""
+    def save_product_upload(self, file, product_id, rendition='product'):
+        """Validate an uploaded product image and store the original by content.
+        
+        If the same bytes were processed before (for the same rendition),
+        'image' in the result is the finished images entry and nothing else
+        needs doing.
+        """
         try:
-            if not file or file.filename == '':
-                return {'success': False, 'error': 'No file selected'}
-            
-            if not allowed_file(file.filename):
-                return {'success': False, 'error': 'Only image files allowed (PNG, JPG, JPEG, GIF, WEBP)'}
-            
-            filename = self._generate_unique_filename(file.filename)
-            
-            product_dir = os.path.join(self.product_images_dir, product_id)
-            os.makedirs(product_dir, exist_ok=True)
+            upload = self._read_upload(file, 'Only image files allowed (PNG, JPG, JPEG, GIF, WEBP)')
+            if isinstance(upload, dict):
+                return upload
             
-            file_path = os.path.join(product_dir, filename)
-            file.save(file_path)
-            
-            self._resize_image(file_path)
-            
-            url_path = f"uploads/products/{product_id}/{filename}"
+            content, ext = upload
+            digest, record = self.images.put(content, ext, f"product:{product_id}")
             
             return {
                 'success': True,
-                'filename': filename,
-                'url': url_path,
-                'file_path': file_path
+                'digest': digest,
+                'filename': f"{digest}{record['ext']}",
+                'url': f"{self.images.url_dir(digest)}/original{record['ext']}",
+                'file_path': self.images.original_path(digest, record['ext']),
+                'image': record['renditions'].get(rendition)
             }
             
         except Exception as e:
             return {'success': False, 'error': f'Upload problem: {str(e)}'}
     
+    def process_product_image(self, digest, store=None, rendition='product'):
+        """Render the variants of a stored original, store them and return its images entry.
+        
+        store(digest, filename, content, format) puts each file where it will
+        be served from and returns its URL; store_local by default, or e.g.
+        Cloud Storage. The entry is recorded as the given rendition.
+        CPU-heavy, so the app runs it in an image worker process. Raises if
+        the file isn't a readable image, after discarding it.
+        """
+        record = self.images.get(digest)
+        if record is None:
+            raise ValueError('Image is no longer stored')
+        if record['renditions'].get(rendition):
+            return record['renditions'][rendition]
+        
+        try:
+            width, height, variants = render_variants(
+                self.images.original_path(digest, record['ext']), self.variants, self.formats)
+        except Exception as e:
+            self.images.discard(digest)
+            raise ValueError(f'Could not process image: {str(e)}')
+        
+        store = store or self.store_local
+        urls = {}  # id(content) -> URL, so sizes sharing an encoding share a file
+        for name, variant in variants.items():
+            for fmt in self.formats:
+                if fmt in variant:
+                    content = variant[fmt]
+                    if id(content) not in urls:
+                        urls[id(content)] = store(digest, f"{name}.{IMAGE_WRITERS[fmt][1]}", content, fmt)
+                    variant[fmt] = urls[id(content)]
+        
+        image = self._image_entry(f"{self.images.url_dir(digest)}/original{record['ext']}",
+                                  width, height, variants)
+        self.images.set_rendition(digest, rendition, image)
+        return image
+    
+    def upload_product_image(self, file, product_id):
+        """Handle product image upload and processing in one go"""
+        result = self.save_product_upload(file, product_id)
+        if not result['success'] or result['image']:
+            return result
+        
+        try:
+            image = self.process_product_image(result['digest'])
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        
+        result.update(url=image['url'], image=image)
+        return result
+    
     def upload_profile_image(self, file, artisan_id):
         """Save and optimize artisan profile photos"""
         try:
-            if not file or file.filename == '':
-                return {'success': False, 'error': 'No file selected'}
+            upload = self._read_upload(file, 'Only image files allowed')
+            if isinstance(upload, dict):
+                return upload
             
-            if not allowed_file(file.filename):
-                return {'success': False, 'error': 'Only image files allowed'}
+            content, ext = upload
+            owner = f"profile:{artisan_id}"
+            digest, record = self.images.put(content, ext, owner)
             
-            filename = self._generate_unique_filename(file.filename)
-            file_path = os.path.join(self.profile_images_dir, filename)
-            file.save(file_path)
-            
-            self._resize_image(file_path, max_width=400, max_height=400)
+            url = record['renditions'].get('profile')
+            if not url:
+                try:
+                    # Straight from the upload bytes; the stored original isn't reread
+                    profile, fmt = render_one(content, (400, 400), self.formats)
+                except Exception as e:
+                    print(f"Couldn't resize image: {e}")
+                    self.images.discard(digest)
+                    return {'success': False, 'error': 'Could not process image'}
+                
+                url = self.store_local(digest, f"profile.{IMAGE_WRITERS[fmt][1]}", profile, fmt)
+                self.images.set_rendition(digest, 'profile', url)
             
-            url_path = f"uploads/profiles/{filename}"
+            # An artisan has one profile photo; let go of the previous one,
+            # now that the new one is ready to replace it
+            self.images.release_owner(owner, keep=digest)
             
+            filename = url.rsplit('/', 1)[-1]
             return {
                 'success': True,
                 'filename': filename,
-                'url': url_path,
-                'file_path': file_path
+                'url': url,
+                'file_path': os.path.join(self.images.blob_dir(digest), filename)
             }
             
         except Exception as e:
@@ -122,23 +224,32 @@ class FileService:
             return False
     
     def get_product_images(self, product_id):
-        """Get all images for a product"""
-        product_dir = os.path.join(self.product_images_dir, product_id)
-        
-        if not os.path.exists(product_dir):
-            return []
+        """Get all original images for a product"""
+        images = [f"{self.images.url_dir(digest)}/original{record['ext']}"
+                  for digest, record in self.images.owned_by(f"product:{product_id}")]
         
-        images = []
-        for filename in os.listdir(product_dir):
-            if filename != '.gitkeep' and allowed_file(filename):
-                url_path = f"uploads/products/{product_id}/{filename}"
-                images.append(url_path)
+        # Uploads from before content addressing live in a per-product folder
+        product_dir = os.path.join(self.product_images_dir, product_id)
+        if os.path.exists(product_dir):
+            for filename in os.listdir(product_dir):
+                if filename != '.gitkeep' and allowed_file(filename):
+                    images.append(f"uploads/products/{product_id}/{filename}")
         
         return images
     
-    def cleanup_orphaned_images(self, valid_product_ids):
-        """Delete images for products that no longer exist"""
+    def cleanup_orphaned_images(self, valid_product_ids, valid_artisan_ids=None):
+        """Drop refs held by products (and artisans, if given) that no longer
+        exist, then delete every stored image nothing refers to"""
         try:
+            self.images.retain_only('product', valid_product_ids)
+            if valid_artisan_ids is not None:
+                self.images.retain_only('profile', valid_artisan_ids)
+            removed = self.images.collect()
+            if removed:
+                print(f"Cleaned up {removed} unused images")
+            
+            # Per-product folders from before content addressing
+            valid_product_ids = set(valid_product_ids)
             for product_dir in os.listdir(self.product_images_dir):
                 full_path = os.path.join(self.product_images_dir, product_dir)
                 
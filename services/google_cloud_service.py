@@ -1,13 +1,30 @@
 import os
 import uuid
-import io
 import tempfile
-from PIL import Image
+from functools import partial
 from google.cloud import storage
 from werkzeug.utils import secure_filename
 from utils.helpers import allowed_file
+from services.image_pipeline import IMAGE_WRITERS, output_formats, render_one
 from config import Config
 
+# Buckets by name, per process; image workers open their own client on first use
+_buckets = {}
+
+def _bucket(bucket_name):
+    if bucket_name not in _buckets:
+        _buckets[bucket_name] = storage.Client().bucket(bucket_name)
+    return _buckets[bucket_name]
+
+def upload_to_bucket(bucket_name, digest, filename, content, fmt):
+    """Storage target for FileService.process_product_image: put a rendition
+    in the bucket under its original's digest and return its public URL.
+    Bind the bucket with functools.partial; runs in the image workers."""
+    blob = _bucket(bucket_name).blob(f"images/{digest}/{filename}")
+    blob.upload_from_string(content, content_type=f'image/{fmt}')
+    blob.make_public()
+    return blob.public_url
+
 class GoogleCloudService:
     def __init__(self):
         """Set up our Google Cloud connection"""
@@ -19,6 +36,7 @@ class GoogleCloudService:
             try:
                 self.storage_client = storage.Client()
                 self.bucket = self.storage_client.bucket(self.bucket_name)
+                _buckets[self.bucket_name] = self.bucket
                 print("🌩️ Connected to Google Cloud Storage!")
             except Exception as e:
                 print(f"⚠️ Google Cloud Storage not available: {e}")
@@ -92,91 +110,35 @@ Now, create the soulful narrative.
         print("✨ Description enhanced with fallback method!")
         return enhanced
     
+    @property
+    def image_target(self):
+        """Where product image renditions go: the bucket, or None to keep them locally"""
+        return partial(upload_to_bucket, self.bucket_name) if self.use_cloud else None
+    
     def _generate_unique_filename(self, original_filename):
         """Create a unique name for the file so no two files have same name"""
         _, ext = os.path.splitext(original_filename)
         unique_name = str(uuid.uuid4())
         return secure_filename(f"{unique_name}{ext}")
     
-    def _enhance_image_with_ai(self, image_bytes):
-        """Use AI to make images look better (simplified for demo)"""
+    @staticmethod
+    def _enhance_image_with_ai(image_bytes):
+        """Use AI to make images look better (simplified for demo).
+        
+        Returns (content, format); the format is picked for the image's
+        content, and is 'jpeg' with the bytes untouched if it fails.
+        """
         try:
             print("🤖 Enhancing image with AI...")
             
-            img = Image.open(io.BytesIO(image_bytes))
-            
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            img.thumbnail((800, 600), Image.Resampling.LANCZOS)
-            
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=90, optimize=True)
+            content, fmt = render_one(image_bytes, (800, 600), output_formats())
             
             print("✨ Image enhanced successfully!")
-            return output.getvalue()
+            return content, fmt
             
         except Exception as e:
             print(f"⚠️ Image enhancement failed: {e}")
-            return image_bytes
-    
-    def upload_product_image(self, file, product_id):
-        """Upload product image with AI enhancement"""
-        try:
-            if not file or file.filename == '':
-                return {'success': False, 'error': 'No file selected'}
-            
-            if not allowed_file(file.filename):
-                return {'success': False, 'error': 'Only image files allowed'}
-            
-            print(f"📸 Uploading image for product {product_id}...")
-            
-
-            file_content = file.read()
-            
-            enhanced_content = self._enhance_image_with_ai(file_content)
-            
-            filename = self._generate_unique_filename(file.filename)
-            
-            if self.use_cloud:
-                blob_path = f"products/{product_id}/{filename}"
-                blob = self.bucket.blob(blob_path)
-                
-                blob.upload_from_string(
-                    enhanced_content,
-                    content_type='image/jpeg'
-                )
-                
-                blob.make_public()
-                
-                url = blob.public_url
-                storage_type = "Google Cloud Storage"
-                
-            else:
-                product_dir = os.path.join('uploads/products', product_id)
-                os.makedirs(product_dir, exist_ok=True)
-                
-                file_path = os.path.join(product_dir, filename)
-                with open(file_path, 'wb') as f:
-                    f.write(enhanced_content)
-                
-                url = f"uploads/products/{product_id}/{filename}"
-                storage_type = "Local Storage"
-            
-            print(f"✅ Image uploaded successfully to {storage_type}!")
-            
-            return {
-                'success': True,
-                'filename': filename,
-                'url': url,
-                'enhanced': True,
-                'storage_type': storage_type,
-                'ai_enhanced': True
-            }
-            
-        except Exception as e:
-            print(f"❌ Upload failed: {e}")
-            return {'success': False, 'error': f'Upload failed: {str(e)}'}
+            return image_bytes, 'jpeg'
     
     def upload_profile_image(self, file, artisan_id):
         """Upload artisan profile image with AI enhancement"""
@@ -190,13 +152,13 @@ Now, create the soulful narrative.
             print(f"👤 Uploading profile image for artisan {artisan_id}...")
             
             file_content = file.read()
-            enhanced_content = self._enhance_image_with_ai(file_content)
-            filename = self._generate_unique_filename(file.filename)
+            enhanced_content, fmt = self._enhance_image_with_ai(file_content)
+            filename = self._generate_unique_filename(f"profile.{IMAGE_WRITERS[fmt][1]}")
             
             if self.use_cloud:
                 blob_path = f"profiles/{filename}"
                 blob = self.bucket.blob(blob_path)
-                blob.upload_from_string(enhanced_content, content_type='image/jpeg')
+                blob.upload_from_string(enhanced_content, content_type=f'image/{fmt}')
                 blob.make_public()
                 url = blob.public_url
                 storage_type = "Google Cloud Storage"
@@ -0,0 +1,115 @@
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+from utils.helpers import generate_id, get_timestamp
+
+class ImageJobQueue:
+    """Runs image work (decode, resize, encode, upload) in a process pool.
+
+    Pillow work is CPU-bound and would otherwise hold the web worker's GIL,
+    so each job runs in a pool process and the request returns straight
+    away with the job record. When a job finishes, on_done(job) is called
+    back in this process to apply the result, and only then is the job
+    marked done. With workers=0 jobs run inline instead (dev, serverless).
+
+    Job records live in memory; the most recent ``history`` are kept for
+    the status endpoint.
+    """
+
+    def __init__(self, workers: int = 2, start_method: Optional[str] = None,
+                 history: int = 1000):
+        self.workers = workers
+        self.start_method = start_method
+        self.history = history
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self, fresh: bool = False) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or fresh:
+                context = (multiprocessing.get_context(self.start_method)
+                           if self.start_method else None)
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+            return self._executor
+
+    def new_job(self, kind: str, product_id: str) -> Dict:
+        """Register a pending job; start it with run() once callers are ready for it to finish"""
+        job = {
+            'id': generate_id(),
+            'kind': kind,
+            'product_id': product_id,
+            'status': 'pending',
+            'created_at': get_timestamp(),
+            'finished_at': None,
+            'image': None,
+            'error': None
+        }
+        with self._lock:
+            self.jobs[job['id']] = job
+            self._prune()
+        return dict(job)
+
+    def run(self, job: Dict, fn: Callable, *args, on_done: Optional[Callable] = None):
+        """Run fn(*args) for the job; its return value becomes job['image']"""
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            try:
+                future = self._pool().submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory on a huge image); start over
+                future = self._pool(fresh=True).submit(fn, *args)
+
+        future.add_done_callback(lambda f: self._finish(job['id'], f, on_done))
+
+    def _finish(self, job_id: str, future: Future, on_done: Optional[Callable]):
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return
+
+        update = {'finished_at': get_timestamp()}
+        try:
+            update['image'] = future.result()
+            update['status'] = 'done'
+        except Exception as e:
+            update['error'] = str(e) or e.__class__.__name__
+            update['status'] = 'failed'
+
+        if on_done is not None:
+            try:
+                on_done(dict(job, **update))
+            except Exception as e:
+                print(f"Couldn't apply image job {job_id}: {e}")
+                update['error'] = f'Could not update product: {e}'
+                update['status'] = 'failed'
+
+        with self._lock:
+            job.update(update)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _prune(self):
+        """Forget the oldest finished jobs past the history limit"""
+        excess = len(self.jobs) - self.history
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self.jobs.items() if job['status'] != 'pending'][:excess]:
+            del self.jobs[job_id]
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
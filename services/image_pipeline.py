@@ -0,0 +1,246 @@
+"""The one image processing path: upload bytes in, encoded renditions out.
+
+Product variants, profile photos, on-demand widths and the enhanced
+upload all go through render_variants()/render_one(), which decode once
+(reduced-size for JPEGs), resize in memory and encode each output into
+its own BytesIO. Storage is left to the caller (local disk, GCS...).
+"""
+import io
+import math
+from PIL import Image, ImageChops, ImageOps, ExifTags, UnidentifiedImageError
+from config import Config
+
+try:
+    import pillow_avif  # noqa: F401  registers AVIF with Pillow < 11.2
+except ImportError:
+    pass
+
+# Pillow format name and file extension per output format
+IMAGE_WRITERS = {
+    'jpeg': ('JPEG', 'jpg'),
+    'webp': ('WEBP', 'webp'),
+    'avif': ('AVIF', 'avif'),
+}
+
+# Artwork with at most this many colours counts as a flat-colour graphic...
+GRAPHIC_MAX_COLORS = 256
+# ...when at least this share of pixels also repeats its left neighbour.
+# Photos, grey ones included, are well below it: sensor noise and JPEG
+# artifacts leave few exact repeats
+GRAPHIC_MIN_FLAT = 0.5
+
+# Decode at least this many times the target size before resampling down,
+# the same headroom Image.thumbnail's reducing_gap keeps for quality
+DRAFT_MARGIN = 2.0
+
+class ImageTooLarge(ValueError):
+    pass
+
+def open_image(source, max_pixels=None):
+    """Open an image from bytes, a path or a file object without decoding it.
+
+    Only the header has been parsed at this point, so images over
+    max_pixels (Config.MAX_IMAGE_PIXELS) - decompression bombs included -
+    are rejected before any pixel data is read. Raises ImageTooLarge, or
+    ValueError for data that isn't an image. A BytesIO over bytes shares
+    their buffer, so the upload isn't copied to be decoded.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+
+    try:
+        img = Image.open(source)
+    except UnidentifiedImageError:
+        raise ValueError('Not a readable image file')
+
+    width, height = img.size
+    limit = max_pixels or Config.MAX_IMAGE_PIXELS
+    if width * height > limit:
+        img.close()
+        raise ImageTooLarge(f'Image is {width}x{height}; at most {limit // 1_000_000} megapixels allowed')
+    return img
+
+def check_image(content, max_pixels=None):
+    """Validate uploaded bytes from the header alone; returns (width, height)"""
+    with open_image(content, max_pixels) as img:
+        return img.size
+
+def _swaps_axes(img):
+    """True when the EXIF orientation turns the stored image by 90 degrees"""
+    return img.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8)
+
+def upright_size(img):
+    """(width, height) as displayed, i.e. after EXIF rotation"""
+    width, height = img.size
+    return (height, width) if _swaps_axes(img) else (width, height)
+
+def reduce_on_decode(img, box):
+    """Let a JPEG decode straight to about the size it will be shrunk to.
+
+    libjpeg can scale by 1/2, 1/4 or 1/8 while decoding (draft mode),
+    which skips most of the work and memory of a full-size decode. The
+    smallest scale still DRAFT_MARGIN times bigger than the fit into box
+    (given in displayed orientation) is used. Must be called before the
+    pixels are loaded; other formats are left as they are.
+    """
+    box_width, box_height = box
+    if _swaps_axes(img):
+        box_width, box_height = box_height, box_width
+
+    width, height = img.size
+    scale = min(box_width / width, box_height / height) * DRAFT_MARGIN
+    if scale < 1:
+        img.draft(None, (math.ceil(width * scale), math.ceil(height * scale)))
+
+def upright(img):
+    """Apply EXIF rotation and settle on RGB, or RGBA when there is transparency"""
+    # In place, so an already upright image isn't copied
+    ImageOps.exif_transpose(img, in_place=True)
+    if img.mode not in ('RGB', 'RGBA'):
+        has_alpha = 'A' in img.mode or 'transparency' in img.info
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    return img
+
+def shrink(img, box):
+    """img scaled down to fit box, like thumbnail() but into a new image so
+    the source can be reused for the next size; img itself if it fits"""
+    width, height = img.size
+    scale = min(box[0] / width, box[1] / height)
+    if scale >= 1:
+        return img
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=DRAFT_MARGIN)
+
+def output_formats(profile=None):
+    """{format: quality} the encoder profile renders and this Pillow can write"""
+    options = Config.IMAGE_ENCODER_PROFILES[profile or Config.IMAGE_ENCODER_PROFILE]
+    Image.init()
+    return {fmt: quality for fmt, quality in Config.IMAGE_FORMATS.items()
+            if fmt in options and IMAGE_WRITERS[fmt][0] in Image.SAVE}
+
+def _is_grey(img):
+    """True when every pixel has R = G = B"""
+    if img.mode not in ('RGB', 'RGBA'):
+        return img.mode in ('L', 'LA')
+    red, green, blue = img.getchannel('R'), img.getchannel('G'), img.getchannel('B')
+    return (ImageChops.difference(red, green).getbbox() is None
+            and ImageChops.difference(red, blue).getbbox() is None)
+
+def _flat_share(img):
+    """Share of pixels exactly equal to the one on their left"""
+    rgb = img.convert('RGB')
+    red, green, blue = ImageChops.difference(rgb, ImageChops.offset(rgb, 1, 0)).split()
+    changed = ImageChops.lighter(ImageChops.lighter(red, green), blue)
+    return changed.histogram()[0] / (img.width * img.height)
+
+def content_kind(img):
+    """'graphic' for flat-colour artwork (transparent or not), 'alpha' for
+    other images that use transparency, otherwise 'photo'. Looks at a
+    nearest-neighbour sample, which only holds colours really in the image.
+
+    A grey image always fits in GRAPHIC_MAX_COLORS, so for those only the
+    flat-area test counts; black and white photos stay photos."""
+    sample = img
+    if img.width > 256 or img.height > 256:
+        sample = img.resize((min(img.width, 256), min(img.height, 256)), Image.Resampling.NEAREST)
+
+    few_colors = _is_grey(sample) or sample.getcolors(GRAPHIC_MAX_COLORS) is not None
+    if few_colors and _flat_share(sample) >= GRAPHIC_MIN_FLAT:
+        return 'graphic'
+    if sample.mode in ('RGBA', 'LA', 'PA') and sample.getchannel('A').getextrema()[0] < 255:
+        return 'alpha'
+    return 'photo'
+
+def choose_formats(img, formats):
+    """{format: extra save options} to encode img in, picked from formats by content.
+
+    Photos get every format. JPEG would flatten transparency and smear
+    the edges of flat colour, so transparent images skip it, and graphics
+    are encoded as lossless WebP only (lossy AVIF smears them as well).
+    When nothing suitable is in formats, all of them are used.
+    """
+    kind = content_kind(img)
+    chosen = {}
+    for fmt in formats:
+        if kind == 'graphic':
+            if fmt == 'webp':
+                chosen[fmt] = {'lossless': True}
+        elif kind == 'photo' or fmt != 'jpeg':
+            chosen[fmt] = {}
+    return chosen or {fmt: {} for fmt in formats}
+
+def pick_format(img, formats):
+    """(format, save options) for a rendition kept in just one format:
+    the smallest-coding choice the content allows"""
+    chosen = choose_formats(img, formats)
+    fmt = next(fmt for fmt in ('avif', 'webp', 'jpeg', *chosen) if fmt in chosen)
+    return fmt, chosen[fmt]
+
+def save_image(img, fp, fmt, quality, options=None, profile=None):
+    """Encode img to a path or file object with the encoder profile's settings for fmt"""
+    pil_format, _ = IMAGE_WRITERS[fmt]
+    params = dict(Config.IMAGE_ENCODER_PROFILES[profile or Config.IMAGE_ENCODER_PROFILE].get(fmt, {}))
+    params.update(options or {})
+    if fmt == 'jpeg' and img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.save(fp, pil_format, quality=quality, **params)
+
+def encode(img, fmt, quality, options=None):
+    """img encoded as fmt, as bytes"""
+    buffer = io.BytesIO()
+    save_image(img, buffer, fmt, quality, options)
+    # getvalue() hands over the buffer's own bytes rather than a copy
+    return buffer.getvalue()
+
+def _area(box):
+    return box[0] * box[1]
+
+def render_variants(source, sizes, formats):
+    """Decode source once and encode each size in the formats that suit it.
+
+    sizes is {name: (max width, max height)}, formats {format: quality}.
+    Sizes are made largest first, each from the one before rather than
+    from the full image; sizes the image already fits share one encoding.
+    Returns the upright original size and
+    {name: {'width', 'height', <format>: bytes}}.
+    """
+    with open_image(source) as img:
+        width, height = upright_size(img)
+        # Only the largest size needs full detail; decode at about that
+        reduce_on_decode(img, max(sizes.values(), key=_area))
+        img = upright(img)
+        chosen = choose_formats(img, formats)
+
+        variants = {}
+        resized = variant = None
+        for name, size in sorted(sizes.items(), key=lambda item: _area(item[1]), reverse=True):
+            smaller = shrink(resized or img, size)
+            if smaller is resized:
+                # Already fits (a small upload): share the same encoded bytes
+                variants[name] = dict(variant)
+                continue
+            resized = smaller
+            variant = {'width': resized.width, 'height': resized.height}
+            for fmt, options in chosen.items():
+                variant[fmt] = encode(resized, fmt, formats[fmt], options)
+            variants[name] = variant
+
+    return width, height, variants
+
+def render_one(source, box, formats, fmt=None):
+    """(bytes, format) of source scaled to fit box (a None side is unbounded).
+
+    With fmt None the format is picked for the content from formats;
+    a given fmt is always used, with options to suit the content.
+    """
+    with open_image(source) as img:
+        full_width, full_height = upright_size(img)
+        box = (box[0] or full_width, box[1] or full_height)
+        reduce_on_decode(img, box)
+        img = shrink(upright(img), box)
+
+        if fmt is None:
+            fmt, options = pick_format(img, formats)
+        else:
+            options = choose_formats(img, [fmt]).get(fmt, {})
+        return encode(img, fmt, formats[fmt], options), fmt
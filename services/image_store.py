@@ -0,0 +1,226 @@
+import os
+import re
+import shutil
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils import serialization
+from utils.helpers import atomic_write, get_timestamp
+
+DIGEST_RE = re.compile(r'[0-9a-f]{64}')
+
+class ImageStore:
+    """Uploaded images stored once per distinct content, with reference counts.
+
+    Each original is filed under the sha256 of its bytes in
+    <root>/<aa>/<digest>/original<ext>, next to whatever renditions were made
+    from it (product sizes, profile crop...). The index, a SQLite file at
+    index_path kept outside the served upload tree, holds per digest
+
+        {'ext', 'size', 'created_at', 'refs': [owner...], 'renditions': {kind: ...}}
+
+    where owners are strings like 'product:<id>' or 'profile:<id>'. A
+    re-upload of the same bytes only adds a ref, and finds the renditions
+    already recorded so nothing is processed again. Blobs nobody refers to
+    any more are deleted by collect(). Every change touches only its own
+    rows, in an IMMEDIATE transaction so worker processes take turns; WAL
+    mode lets lookups read without waiting on them.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS images (
+            digest TEXT PRIMARY KEY,
+            ext TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TEXT,
+            renditions TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE TABLE IF NOT EXISTS refs (
+            digest TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            PRIMARY KEY (digest, owner)
+        );
+        CREATE INDEX IF NOT EXISTS idx_refs_owner ON refs (owner);
+    """
+
+    def __init__(self, root: str, index_path: str, url_prefix: Optional[str] = None):
+        self.root = root
+        self.index_path = index_path
+        self.url_prefix = url_prefix or root.replace(os.sep, '/')
+        # One connection per thread (and per worker process, see __getstate__)
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+        self._conn().executescript(self.SCHEMA)
+        self._import_legacy_index()
+
+    def __getstate__(self):
+        # Sent to image worker processes; they open their own connections
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @staticmethod
+    def digest(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def blob_dir(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def url_dir(self, digest: str) -> str:
+        return f"{self.url_prefix}/{digest[:2]}/{digest}"
+
+    def exists(self, digest: str) -> bool:
+        """Cheap check (no index read) that digest names a stored blob"""
+        return bool(DIGEST_RE.fullmatch(digest)) and os.path.isdir(self.blob_dir(digest))
+
+    def original_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.blob_dir(digest), f"original{ext}")
+
+    # Index
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit; _write() opens the transactions itself
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _record(self, conn, row) -> Dict:
+        digest, ext, size, created_at, renditions = row
+        refs = [owner for (owner,) in conn.execute(
+            "SELECT owner FROM refs WHERE digest = ? ORDER BY rowid", (digest,))]
+        return {'ext': ext, 'size': size, 'created_at': created_at,
+                'refs': refs, 'renditions': serialization.loads(renditions)}
+
+    def _get(self, conn, digest: str) -> Optional[Dict]:
+        row = conn.execute("SELECT digest, ext, size, created_at, renditions FROM images "
+                           "WHERE digest = ?", (digest,)).fetchone()
+        return self._record(conn, row) if row else None
+
+    def _import_legacy_index(self):
+        """Move an index.json left in the upload tree by older versions into
+        the database, then delete it (and its lock file) from there"""
+        legacy = os.path.join(self.root, "index.json")
+        try:
+            with open(legacy, 'rb') as f:
+                index = serialization.loads(f.read())
+        except FileNotFoundError:
+            return
+
+        with self._write() as conn:
+            for digest, record in index.items():
+                conn.execute("INSERT OR IGNORE INTO images (digest, ext, size, created_at, renditions) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             (digest, record['ext'], record['size'], record.get('created_at'),
+                              serialization.dumps(record.get('renditions', {})).decode('utf-8')))
+                conn.executemany("INSERT OR IGNORE INTO refs (digest, owner) VALUES (?, ?)",
+                                 [(digest, owner) for owner in record.get('refs', [])])
+        for path in (legacy, os.path.join(self.root, ".lock")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, digest: str) -> Optional[Dict]:
+        return self._get(self._conn(), digest)
+
+    def put(self, content: bytes, ext: str, owner: str) -> Tuple[str, Dict]:
+        """Store content (unless it's already there) and add owner's ref.
+
+        Returns (digest, record); record['renditions'] is non-empty when the
+        same bytes were uploaded and processed before.
+        """
+        digest = self.digest(content)
+        with self._write() as conn:
+            record = self._get(conn, digest)
+            path = self.original_path(digest, record['ext'] if record else ext.lower())
+            if record is None or not os.path.exists(path):
+                os.makedirs(self.blob_dir(digest), exist_ok=True)
+                atomic_write(path, lambda f: f.write(content), binary=True)
+            if record is None:
+                conn.execute("INSERT INTO images (digest, ext, size, created_at) VALUES (?, ?, ?, ?)",
+                             (digest, ext.lower(), len(content), get_timestamp()))
+            conn.execute("INSERT OR IGNORE INTO refs (digest, owner) VALUES (?, ?)", (digest, owner))
+            record = self._get(conn, digest)
+        return digest, record
+
+    def set_rendition(self, digest: str, kind: str, value):
+        """Record a processed version of a blob so later uploads can reuse it"""
+        with self._write() as conn:
+            row = conn.execute("SELECT renditions FROM images WHERE digest = ?", (digest,)).fetchone()
+            if row:
+                renditions = serialization.loads(row[0])
+                renditions[kind] = value
+                conn.execute("UPDATE images SET renditions = ? WHERE digest = ?",
+                             (serialization.dumps(renditions).decode('utf-8'), digest))
+
+    # References and cleanup
+    def release_owner(self, owner: str, keep: Optional[str] = None):
+        """Drop every ref owner holds, except on the keep digest"""
+        with self._write() as conn:
+            conn.execute("DELETE FROM refs WHERE owner = ? AND digest IS NOT ?", (owner, keep))
+
+    def owned_by(self, owner: str) -> List[Tuple[str, Dict]]:
+        """(digest, record) for every blob owner refers to"""
+        conn = self._conn()
+        rows = conn.execute("SELECT images.digest, ext, size, created_at, renditions "
+                            "FROM refs JOIN images ON images.digest = refs.digest "
+                            "WHERE owner = ? ORDER BY refs.rowid", (owner,)).fetchall()
+        return [(row[0], self._record(conn, row)) for row in rows]
+
+    def retain_only(self, prefix: str, valid_ids: Iterable[str]) -> int:
+        """Drop refs from '<prefix>:<id>' owners whose id isn't in valid_ids"""
+        keep = {f"{prefix}:{owner_id}" for owner_id in valid_ids}
+        with self._write() as conn:
+            owners = [owner for (owner,) in conn.execute(
+                "SELECT DISTINCT owner FROM refs WHERE substr(owner, 1, ?) = ?",
+                (len(prefix) + 1, prefix + ':'))]
+            dropped = 0
+            for owner in owners:
+                if owner not in keep:
+                    dropped += conn.execute("DELETE FROM refs WHERE owner = ?", (owner,)).rowcount
+        return dropped
+
+    def discard(self, digest: str):
+        """Forget a blob and delete its files regardless of refs (e.g. not an image)"""
+        with self._write() as conn:
+            conn.execute("DELETE FROM refs WHERE digest = ?", (digest,))
+            conn.execute("DELETE FROM images WHERE digest = ?", (digest,))
+            self._remove_files(digest)
+
+    def _remove_files(self, digest: str):
+        shutil.rmtree(self.blob_dir(digest), ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(self.blob_dir(digest)))
+        except OSError:
+            pass  # other blobs still share the shard folder
+
+    def collect(self) -> int:
+        """Delete every blob with no refs left; returns how many went"""
+        with self._write() as conn:
+            unused = [digest for (digest,) in conn.execute(
+                "SELECT digest FROM images WHERE digest NOT IN (SELECT digest FROM refs)")]
+            for digest in unused:
+                conn.execute("DELETE FROM images WHERE digest = ?", (digest,))
+                self._remove_files(digest)
+        return len(unused)
@@ -0,0 +1,79 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+class CachedResponse:
+    """Encoded body of a 200 response plus its strong ETag.
+
+    Compressed variants are built on first request for each content-coding
+    and kept with the entry, so identical bodies are never recompressed.
+    """
+
+    __slots__ = ('body', 'etag', 'mimetype', 'variants')
+
+    def __init__(self, body: bytes, mimetype: str):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.mimetype = mimetype
+        self.variants: Dict[str, Tuple[bytes, str]] = {}
+
+    def encoded(self, encoding: str, compress: Callable[[bytes, str], bytes]) -> Tuple[bytes, str]:
+        """(body, ETag) for a content-coding; each coding gets its own strong ETag"""
+        variant = self.variants.get(encoding)
+        if variant is None:
+            variant = (compress(self.body, encoding), f'{self.etag}-{encoding}')
+            self.variants[encoding] = variant
+        return variant
+
+class ResponseCache:
+    """Pre-serialized responses keyed on (endpoint, args) for one catalog generation.
+
+    Entries are only valid for the generation they were stored under: the
+    first lookup or store with a newer generation drops everything, so a
+    write to the catalog invalidates every cached body at once. Within a
+    generation the least recently used entries are evicted past max_entries.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.generation = None
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, key: Hashable, generation) -> Optional[CachedResponse]:
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, generation, body: bytes, mimetype: str) -> CachedResponse:
+        entry = CachedResponse(body, mimetype)
+        if self.max_entries <= 0:
+            return entry
+
+        with self._lock:
+            # A newer generation may have been seen while the body was built;
+            # storing it then would outlive the data it came from
+            if self.generation is not None and generation < self.generation:
+                return entry
+            self._check_generation(generation)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,197 @@
+import re
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text) -> List[str]:
+    """Lowercase word tokens; accepts a string or a list of strings"""
+    if not text:
+        return []
+    if not isinstance(text, str):
+        text = ' '.join(str(t) for t in text if t)
+    return TOKEN_RE.findall(text.lower())
+
+class SearchIndex:
+    """Inverted index over product text, maintained record by record.
+
+    postings[field][term] maps doc id -> term frequency in that field. The
+    vocabulary is also kept as a sorted list so a query term can be expanded
+    to every indexed term it is a prefix of (type-ahead) with two bisects.
+    Per-field document lengths are tracked as well for BM25 ranking.
+    """
+
+    FIELDS = ('name', 'description', 'materials', 'tags')
+
+    # BM25 parameters and per-field weights (name and tags matter most)
+    K1 = 1.2
+    B = 0.75
+    FIELD_BOOSTS = {'name': 3.0, 'tags': 2.0, 'description': 1.0, 'materials': 1.0}
+
+    # Longer terms a query token is scored on besides itself (see _ranking_terms)
+    MAX_EXPANSIONS = 20
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, Dict[str, int]]] = {f: {} for f in self.FIELDS}
+        self.doc_terms: Dict[str, Dict[str, Counter]] = {}
+        self.field_lengths: Dict[str, Dict[str, int]] = {f: {} for f in self.FIELDS}
+        self._total_lengths: Dict[str, int] = {f: 0 for f in self.FIELDS}
+        self.vocabulary: List[str] = []
+        self._term_refs: Dict[str, int] = {}
+        self._order: Dict[str, int] = {}
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    @staticmethod
+    def _fields_of(product) -> Dict[str, Counter]:
+        return {
+            'name': Counter(tokenize(product.name)),
+            'description': Counter(tokenize(product.description)),
+            'materials': Counter(tokenize(product.materials)),
+            'tags': Counter(tokenize(product.tags)),
+        }
+
+    def add(self, product):
+        """Index a product, replacing whatever was indexed for its id before"""
+        if product.id in self.doc_terms:
+            self.remove(product.id)
+        else:
+            self._order[product.id] = self._next_order
+            self._next_order += 1
+
+        fields = self._fields_of(product)
+        self.doc_terms[product.id] = fields
+        for field, counts in fields.items():
+            length = sum(counts.values())
+            self.field_lengths[field][product.id] = length
+            self._total_lengths[field] += length
+
+            postings = self.postings[field]
+            for term, tf in counts.items():
+                postings.setdefault(term, {})[product.id] = tf
+                refs = self._term_refs.get(term, 0)
+                if refs == 0:
+                    insort(self.vocabulary, term)
+                self._term_refs[term] = refs + 1
+
+    def remove(self, doc_id: str):
+        fields = self.doc_terms.pop(doc_id, None)
+        if fields is None:
+            return
+        for field, counts in fields.items():
+            self._total_lengths[field] -= self.field_lengths[field].pop(doc_id, 0)
+
+            postings = self.postings[field]
+            for term in counts:
+                docs = postings.get(term)
+                if docs is not None:
+                    docs.pop(doc_id, None)
+                    if not docs:
+                        del postings[term]
+                refs = self._term_refs[term] - 1
+                if refs:
+                    self._term_refs[term] = refs
+                else:
+                    del self._term_refs[term]
+                    del self.vocabulary[bisect_left(self.vocabulary, term)]
+
+    def expand(self, prefix: str) -> List[str]:
+        """Every indexed term starting with prefix"""
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + '\uffff', start)
+        return self.vocabulary[start:end]
+
+    def _docs_for_terms(self, terms: Iterable[str]) -> Set[str]:
+        docs = set()
+        for term in terms:
+            for field in self.FIELDS:
+                docs.update(self.postings[field].get(term, ()))
+        return docs
+
+    def match(self, query: str) -> Set[str]:
+        """Ids of docs containing every query token (each matched as a prefix)"""
+        tokens = tokenize(query)
+        if not tokens:
+            return set()
+
+        result = None
+        # Most selective (longest) tokens first keeps the intersection small
+        for token in sorted(set(tokens), key=len, reverse=True):
+            docs = self._docs_for_terms(self.expand(token))
+            result = docs if result is None else result & docs
+            if not result:
+                break
+        return result
+
+    def search(self, query: str) -> List[str]:
+        """Matching ids in the order their products were first indexed"""
+        order = self._order
+        return sorted(self.match(query), key=order.__getitem__)
+
+    def _ranking_terms(self, token: str) -> List[str]:
+        """The terms a query token is scored on: itself when indexed, plus
+        its MAX_EXPANSIONS most common longer completions. A short prefix
+        can expand to thousands of terms; the rare ones add next to nothing
+        to the scores but would each cost a pass over their postings."""
+        completions = [t for t in self.expand(token) if t != token]
+        if len(completions) > self.MAX_EXPANSIONS:
+            completions = heapq.nlargest(
+                self.MAX_EXPANSIONS, completions,
+                key=lambda t: sum(len(self.postings[f].get(t, ())) for f in self.FIELDS))
+        return ([token] if token in self._term_refs else []) + completions
+
+    def rank(self, query: str, limit: Optional[int] = None,
+             within: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """(doc id, BM25 score) for matching docs, best first.
+
+        Each scored term's postings are walked once and its BM25 weights
+        added into a score vector over the candidates, so the work follows
+        the postings rather than terms x candidates. Only the top ``limit``
+        are pulled out with a heap instead of sorting everything.
+        ``within`` restricts the candidates before scoring (other filters).
+        """
+        matches = self.match(query)
+        candidates = list(matches & within if within is not None else matches)
+        if not candidates:
+            return []
+
+        terms = sorted({t for token in set(tokenize(query)) for t in self._ranking_terms(token)})
+        column = {doc_id: i for i, doc_id in enumerate(candidates)}
+        n_docs = len(self.doc_terms)
+        # A term counts as present in a doc if it appears in any field
+        idf = {}
+        for term in terms:
+            df = len(self._docs_for_terms((term,)))
+            idf[term] = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+        scores = np.zeros(len(candidates), dtype=np.float64)
+        for field in self.FIELDS:
+            postings = self.postings[field]
+            lengths = self.field_lengths[field]
+            avg_len = self._total_lengths[field] / n_docs or 1.0
+            norm = None
+            for term in terms:
+                docs = postings.get(term)
+                if not docs:
+                    continue
+                hits = [(column[d], tf) for d, tf in docs.items() if d in column]
+                if not hits:
+                    continue
+                if norm is None:
+                    doc_len = np.array([lengths.get(d, 0) for d in candidates], dtype=np.float64)
+                    norm = self.K1 * (1 - self.B + self.B * doc_len / avg_len)
+
+                cols, tf = np.array(hits, dtype=np.float64).T
+                cols = cols.astype(np.intp)
+                scores[cols] += self.FIELD_BOOSTS[field] * idf[term] * tf * (self.K1 + 1) / (tf + norm[cols])
+
+        k = len(candidates) if limit is None else max(0, int(limit))
+        order = self._order
+        best = heapq.nlargest(k, range(len(candidates)),
+                              key=lambda i: (scores[i], -order[candidates[i]]))
+        return [(candidates[i], float(scores[i])) for i in best]
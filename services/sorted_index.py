@@ -0,0 +1,61 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Sorts above every real id, so (key, ID_MAX) bounds all entries sharing key
+ID_MAX = '\U0010ffff'
+
+class SortedIndex:
+    """(key, id) pairs kept in sorted order with bisect.
+
+    Range scans and ordered walks start with a binary search and then only
+    touch the entries they return. Ties on key are broken by id, so every
+    position is unique and can be resumed from by a pagination cursor.
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[Any, str]] = []
+        self.keys: Dict[str, Any] = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def build(self, pairs: Iterable[Tuple[str, Any]]):
+        """Replace the contents from (id, key) pairs with one sort"""
+        self.keys = dict(pairs)
+        self.entries = sorted((key, doc_id) for doc_id, key in self.keys.items())
+
+    def add(self, doc_id: str, key):
+        old = self.keys.get(doc_id)
+        if doc_id in self.keys:
+            if old == key:
+                return
+            self.remove(doc_id)
+        self.keys[doc_id] = key
+        insort(self.entries, (key, doc_id))
+
+    def remove(self, doc_id: str):
+        if doc_id not in self.keys:
+            return
+        entry = (self.keys.pop(doc_id), doc_id)
+        pos = bisect_left(self.entries, entry)
+        if pos < len(self.entries) and self.entries[pos] == entry:
+            del self.entries[pos]
+
+    def range(self, low=None, high=None) -> List[str]:
+        """Ids with low <= key <= high (either bound optional), in key order"""
+        start = 0 if low is None else bisect_left(self.entries, (low,))
+        end = len(self.entries) if high is None else bisect_right(self.entries, (high, ID_MAX))
+        return [doc_id for _, doc_id in self.entries[start:end]]
+
+    def walk(self, descending: bool = False,
+             after: Optional[Tuple[Any, str]] = None) -> Iterator[Tuple[Any, str]]:
+        """Entries in order, starting just past the ``after`` entry if given"""
+        entries = self.entries
+        if not descending:
+            start = 0 if after is None else bisect_right(entries, tuple(after))
+            for i in range(start, len(entries)):
+                yield entries[i]
+        else:
+            start = len(entries) if after is None else bisect_left(entries, tuple(after))
+            for i in range(start - 1, -1, -1):
+                yield entries[i]
@@ -0,0 +1,551 @@
+import os
+import sqlite3
+import threading
+from contextlib import nullcontext
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from utils import serialization
+from utils.helpers import (load_json_data, atomic_write, FileLock,
+                           read_generation, bump_generation)
+
+def _write_snapshot(rows, path):
+    """save_json_data that raises instead of returning False, so nothing
+    that depends on the write (dropping a log, bumping the generation)
+    goes ahead after a failure"""
+    encoded = serialization.dumps(rows, pretty=True)
+    atomic_write(path, lambda f: f.write(encoded), binary=True)
+
+class StorageBackend:
+    """Where DataService persists artisans and products.
+
+    Rows are plain dicts in the to_dict() shape. The save_* methods take the
+    records that changed plus a zero-argument snapshot callable returning
+    every record, so backends that can only rewrite a whole collection still
+    work while row-oriented ones only touch what changed.
+    """
+
+    # True when find_* read the store incrementally rather than parsing it
+    # whole, i.e. when streaming from the store beats the in-memory catalog
+    streams_reads = False
+
+    def load_artisans(self) -> List[dict]:
+        raise NotImplementedError
+
+    def load_products(self) -> List[dict]:
+        raise NotImplementedError
+
+    def save_artisans(self, changed: List[dict], snapshot: Callable[[], List[dict]]):
+        raise NotImplementedError
+
+    def save_products(self, changed: List[dict], snapshot: Callable[[], List[dict]]):
+        raise NotImplementedError
+
+    def load_all(self) -> Tuple[List[dict], List[dict], Any]:
+        """(artisans, products, position): every row, plus where changes_since
+        should pick up from (None if this backend can't tell)"""
+        return self.load_artisans(), self.load_products(), None
+
+    def changes_since(self, position) -> Optional[Tuple[List[dict], List[dict], Any]]:
+        """(artisans, products, position) for rows written after position, in
+        write order, or None when only a full load_all() will do. Rows already
+        seen may come back again; every row is a full record, so reapplying
+        one does no harm."""
+        return None
+
+    def find_artisans(self, updated_since=None) -> Iterator[dict]:
+        """Stream stored artisans, optionally only those updated after a timestamp"""
+        raise NotImplementedError
+
+    def find_products(self, artisan_id=None, category=None, status=None,
+                      featured=None, min_price=None, max_price=None,
+                      updated_since=None) -> Iterator[dict]:
+        """Stream stored products matching every filter that is not None"""
+        raise NotImplementedError
+
+    def stamp(self):
+        """Opaque token that changes whenever someone else modifies the data"""
+        raise NotImplementedError
+
+    def write_lock(self):
+        """Lock held by DataService around each read-modify-write cycle.
+
+        It has to exclude other worker processes too, not just other threads.
+        """
+        return nullcontext()
+
+class JsonFileStorage(StorageBackend):
+    """The original data/artisans.json + data/products.json layout.
+
+    Files are replaced atomically, writers in every worker process serialize
+    on data/.lock, and each write bumps the counter in data/.generation so
+    other workers notice even when mtime/size happen to come out the same.
+    """
+
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+        self.artisans_file = os.path.join(data_dir, "artisans.json")
+        self.products_file = os.path.join(data_dir, "products.json")
+        self.generation_file = os.path.join(data_dir, ".generation")
+        self.lock = FileLock(os.path.join(data_dir, ".lock"))
+
+        os.makedirs(data_dir, exist_ok=True)
+
+        if not os.path.exists(self.artisans_file):
+            _write_snapshot([], self.artisans_file)
+
+        if not os.path.exists(self.products_file):
+            _write_snapshot([], self.products_file)
+
+    def load_artisans(self) -> List[dict]:
+        return load_json_data(self.artisans_file)
+
+    def load_products(self) -> List[dict]:
+        return load_json_data(self.products_file)
+
+    def save_artisans(self, changed, snapshot):
+        with self.lock:
+            _write_snapshot(snapshot(), self.artisans_file)
+            bump_generation(self.generation_file)
+
+    def save_products(self, changed, snapshot):
+        with self.lock:
+            _write_snapshot(snapshot(), self.products_file)
+            bump_generation(self.generation_file)
+
+    def find_artisans(self, updated_since=None):
+        for row in self.load_artisans():
+            if updated_since is None or row.get('updated_at', '') > updated_since:
+                yield row
+
+    def find_products(self, artisan_id=None, category=None, status=None,
+                      featured=None, min_price=None, max_price=None,
+                      updated_since=None):
+        category = category.lower() if category else None
+        for row in self.load_products():
+            if artisan_id is not None and row['artisan_id'] != artisan_id:
+                continue
+            if category is not None and row['category'].lower() != category:
+                continue
+            if status is not None and row.get('status', 'active') != status:
+                continue
+            if featured is not None and bool(row.get('featured')) != featured:
+                continue
+            if min_price is not None and float(row['price']) < min_price:
+                continue
+            if max_price is not None and float(row['price']) > max_price:
+                continue
+            if updated_since is not None and row.get('updated_at', '') <= updated_since:
+                continue
+            yield row
+
+    def _file_stamps(self, *paths):
+        stamp = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return stamp
+
+    def stamp(self):
+        # File stats still catch hand edits that don't bump the generation
+        return (read_generation(self.generation_file),
+                *self._file_stamps(self.artisans_file, self.products_file))
+
+    def write_lock(self):
+        return self.lock
+
+class JsonLogStorage(JsonFileStorage):
+    """JSON snapshots plus an append-only NDJSON change log.
+
+    Each save appends one ``{"kind": ..., "data": ...}`` line per changed
+    record instead of rewriting the snapshot. Loading reads the snapshot and
+    replays the log on top. Once the log grows past ``compact_bytes`` a
+    background thread folds it into fresh snapshots. The log is renamed aside
+    before folding and only removed after the snapshots are replaced, so a
+    crash in between just replays entries the snapshot already holds, which
+    is harmless because every entry is a full record.
+    """
+
+    def __init__(self, data_dir="data", compact_bytes=1024 * 1024):
+        super().__init__(data_dir)
+        self.log_file = os.path.join(data_dir, "changes.log")
+        self.compacting_file = self.log_file + ".compacting"
+        self.compact_bytes = compact_bytes
+
+        self._compactor = None
+
+    def _parse_log(self, data, path):
+        for line in data.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield serialization.loads(line)
+            except serialization.DecodeError:
+                # A torn final line from a crash mid-append
+                print(f"Warning: skipping unreadable line in {path}")
+
+    def _read_log(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        yield from self._parse_log(data, path)
+
+    def _replay(self, kind, rows):
+        records = {row['id']: row for row in rows}
+        for path in (self.compacting_file, self.log_file):
+            for entry in self._read_log(path):
+                if entry.get('kind') == kind:
+                    records[entry['data']['id']] = entry['data']
+        return list(records.values())
+
+    # Loads take the lock so they never see a compaction half way through
+    def load_artisans(self):
+        with self.lock:
+            return self._replay('artisan', super().load_artisans())
+
+    def load_products(self):
+        with self.lock:
+            return self._replay('product', super().load_products())
+
+    def _position(self):
+        """Where the next changes_since() starts: the snapshots and
+        .compacting log it is valid for, and the live log's inode and size"""
+        try:
+            st = os.stat(self.log_file)
+            log = (st.st_ino, st.st_size)
+        except FileNotFoundError:
+            log = None
+        return (self._file_stamps(self.artisans_file, self.products_file, self.compacting_file), log)
+
+    def load_all(self):
+        with self.lock:
+            return self.load_artisans(), self.load_products(), self._position()
+
+    def changes_since(self, position):
+        """Just the live log's new lines; compaction or a hand edit of the
+        snapshots means a full load"""
+        files, log = position
+        with self.lock:
+            if self._file_stamps(self.artisans_file, self.products_file,
+                                 self.compacting_file) != files:
+                return None
+            try:
+                with open(self.log_file, 'rb') as f:
+                    st = os.fstat(f.fileno())
+                    offset = 0
+                    if log is not None:
+                        inode, offset = log
+                        if st.st_ino != inode or st.st_size < offset:
+                            return None
+                    f.seek(offset)
+                    data = f.read()
+            except FileNotFoundError:
+                # Only compaction removes the log, and that replaces the snapshots
+                return ([], [], position) if log is None else None
+
+        artisans, products = [], []
+        for entry in self._parse_log(data, self.log_file):
+            rows = {'artisan': artisans, 'product': products}.get(entry.get('kind'))
+            if rows is not None:
+                rows.append(entry['data'])
+        return artisans, products, (files, (st.st_ino, offset + len(data)))
+
+    def _append(self, kind, changed):
+        lines = b''.join(serialization.dumps({'kind': kind, 'data': row}) + b'\n'
+                         for row in changed)
+        with self.lock:
+            with open(self.log_file, 'ab') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            bump_generation(self.generation_file)
+            size = os.path.getsize(self.log_file)
+        if size >= self.compact_bytes:
+            self.compact_in_background()
+
+    def save_artisans(self, changed, snapshot=None):
+        self._append('artisan', changed)
+
+    def save_products(self, changed, snapshot=None):
+        self._append('product', changed)
+
+    def compact(self):
+        """Fold the change log into fresh artisans.json/products.json snapshots"""
+        with self.lock:
+            if not os.path.exists(self.compacting_file):
+                if not os.path.exists(self.log_file):
+                    return False
+                os.replace(self.log_file, self.compacting_file)
+
+            artisans = self._replay('artisan', JsonFileStorage.load_artisans(self))
+            products = self._replay('product', JsonFileStorage.load_products(self))
+
+            # The snapshots already hold everything in the live log, so it
+            # doesn't matter that the live log is replayed into them here too.
+            # If either write fails, the .compacting log stays for next time.
+            _write_snapshot(artisans, self.artisans_file)
+            _write_snapshot(products, self.products_file)
+            os.remove(self.compacting_file)
+            bump_generation(self.generation_file)
+            return True
+
+    def compact_in_background(self):
+        if self._compactor and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self._compact_safely, daemon=True)
+        self._compactor.start()
+
+    def _compact_safely(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Log compaction failed: {e}")
+
+    def stamp(self):
+        return (*super().stamp(), *self._file_stamps(self.log_file, self.compacting_file))
+
+class SQLiteStorage(StorageBackend):
+    """Single-file SQLite store with the hot filter columns pulled out and indexed.
+
+    The full record lives in the ``data`` column as JSON; the extra columns
+    only exist so filters can be answered by the indexes. Writes are
+    single-row upserts in WAL mode, so readers never block on a writer.
+    Each write also takes the next ``seq`` of its table, which is what
+    changes_since() reads from. (updated_at can't serve: it is stamped
+    before the write lock is taken, so it doesn't follow commit order.)
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS artisans (
+            id TEXT PRIMARY KEY,
+            email TEXT,
+            craft_type TEXT,
+            verified INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            seq INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS products (
+            id TEXT PRIMARY KEY,
+            artisan_id TEXT NOT NULL,
+            category TEXT,
+            status TEXT,
+            featured INTEGER NOT NULL DEFAULT 0,
+            price REAL,
+            created_at TEXT,
+            updated_at TEXT,
+            seq INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_artisans_email ON artisans (lower(email));
+        CREATE INDEX IF NOT EXISTS idx_artisans_updated ON artisans (updated_at);
+        CREATE INDEX IF NOT EXISTS idx_products_artisan ON products (artisan_id);
+        CREATE INDEX IF NOT EXISTS idx_products_category ON products (category);
+        CREATE INDEX IF NOT EXISTS idx_products_status ON products (status);
+        CREATE INDEX IF NOT EXISTS idx_products_featured ON products (featured);
+        CREATE INDEX IF NOT EXISTS idx_products_price ON products (price);
+        CREATE INDEX IF NOT EXISTS idx_products_updated ON products (updated_at);
+    """
+    # Created once databases from before the seq column have been given it
+    SEQ_INDEXES = """
+        CREATE INDEX IF NOT EXISTS idx_artisans_seq ON artisans (seq);
+        CREATE INDEX IF NOT EXISTS idx_products_seq ON products (seq);
+    """
+
+    streams_reads = True
+    FETCH_BATCH = 500
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self.write_file_lock = FileLock(db_path + ".lock")
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        for table in ('artisans', 'products'):
+            columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            if 'seq' not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+        self.conn.executescript(self.SEQ_INDEXES)
+
+    @staticmethod
+    def _encode(row):
+        return serialization.dumps(row).decode('utf-8')
+
+    def _artisan_params(self, row):
+        return (row['id'], row.get('email'), row.get('craft_type'),
+                int(bool(row.get('verified'))), row.get('updated_at'), self._encode(row))
+
+    def _product_params(self, row):
+        return (row['id'], row['artisan_id'], (row.get('category') or '').lower(),
+                row.get('status', 'active'), int(bool(row.get('featured'))),
+                float(row['price']), row.get('created_at'), row.get('updated_at'),
+                self._encode(row))
+
+    def load_artisans(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT data FROM artisans ORDER BY rowid").fetchall()
+        return [serialization.loads(data) for (data,) in rows]
+
+    def load_products(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT data FROM products ORDER BY rowid").fetchall()
+        return [serialization.loads(data) for (data,) in rows]
+
+    def _max_seqs(self):
+        return tuple(self.conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {table}").fetchone()[0]
+                     for table in ('artisans', 'products'))
+
+    def load_all(self):
+        # Read the position first: rows written meanwhile are loaded and then
+        # handed out again by changes_since, which is harmless
+        with self._lock:
+            position = self._max_seqs()
+        return self.load_artisans(), self.load_products(), position
+
+    def changes_since(self, position):
+        artisan_seq, product_seq = position
+        with self._lock:
+            artisans = self.conn.execute("SELECT seq, data FROM artisans WHERE seq > ? ORDER BY seq",
+                                         (artisan_seq,)).fetchall()
+            products = self.conn.execute("SELECT seq, data FROM products WHERE seq > ? ORDER BY seq",
+                                         (product_seq,)).fetchall()
+        return ([serialization.loads(data) for _, data in artisans],
+                [serialization.loads(data) for _, data in products],
+                (artisans[-1][0] if artisans else artisan_seq,
+                 products[-1][0] if products else product_seq))
+
+    def save_artisans(self, changed, snapshot=None):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                """INSERT INTO artisans (id, email, craft_type, verified, updated_at, data, seq)
+                   VALUES (?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM artisans))
+                   ON CONFLICT(id) DO UPDATE SET
+                       email=excluded.email, craft_type=excluded.craft_type,
+                       verified=excluded.verified, updated_at=excluded.updated_at,
+                       data=excluded.data, seq=excluded.seq""",
+                [self._artisan_params(row) for row in changed])
+
+    def save_products(self, changed, snapshot=None):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                """INSERT INTO products (id, artisan_id, category, status, featured,
+                                         price, created_at, updated_at, data, seq)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?,
+                           (SELECT COALESCE(MAX(seq), 0) + 1 FROM products))
+                   ON CONFLICT(id) DO UPDATE SET
+                       artisan_id=excluded.artisan_id, category=excluded.category,
+                       status=excluded.status, featured=excluded.featured,
+                       price=excluded.price, created_at=excluded.created_at,
+                       updated_at=excluded.updated_at, data=excluded.data,
+                       seq=excluded.seq""",
+                [self._product_params(row) for row in changed])
+
+    def _stream(self, sql, params):
+        """Yield decoded rows in batches from a private read connection.
+
+        WAL gives that connection its own consistent snapshot, so a long
+        export neither holds the shared connection nor blocks writers.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(self.FETCH_BATCH)
+                if not rows:
+                    break
+                for (data,) in rows:
+                    yield serialization.loads(data)
+        finally:
+            conn.close()
+
+    def find_artisans(self, updated_since=None):
+        if updated_since is None:
+            return self._stream("SELECT data FROM artisans ORDER BY rowid", ())
+        return self._stream("SELECT data FROM artisans WHERE updated_at > ? ORDER BY updated_at",
+                            (updated_since,))
+
+    def find_products(self, artisan_id=None, category=None, status=None,
+                      featured=None, min_price=None, max_price=None,
+                      updated_since=None):
+        clauses, params = [], []
+        if artisan_id is not None:
+            clauses.append("artisan_id = ?")
+            params.append(artisan_id)
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category.lower())
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if featured is not None:
+            clauses.append("featured = ?")
+            params.append(int(bool(featured)))
+        if min_price is not None:
+            clauses.append("price >= ?")
+            params.append(float(min_price))
+        if max_price is not None:
+            clauses.append("price <= ?")
+            params.append(float(max_price))
+        if updated_since is not None:
+            clauses.append("updated_at > ?")
+            params.append(updated_since)
+
+        sql = "SELECT data FROM products"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY updated_at" if updated_since is not None else " ORDER BY rowid"
+
+        return self._stream(sql, params)
+
+    def stamp(self):
+        # data_version only moves when *another* connection commits
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def write_lock(self):
+        # SQLite keeps single statements safe; this covers DataService's
+        # read-modify-write cycles such as bumping total_products
+        return self.write_file_lock
+
+def create_storage(backend: str = "json", data_dir: str = "data",
+                   sqlite_path: Optional[str] = None, write_log: bool = False,
+                   compact_bytes: int = 1024 * 1024) -> StorageBackend:
+    """Build the storage backend named in Config.STORAGE_BACKEND"""
+    backend = (backend or "json").lower()
+    if backend == "json":
+        if write_log:
+            return JsonLogStorage(data_dir, compact_bytes)
+        return JsonFileStorage(data_dir)
+    if backend == "sqlite":
+        return SQLiteStorage(sqlite_path or os.path.join(data_dir, "kala_kaksh.db"))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+def migrate_json_to_sqlite(data_dir: str = "data", db_path: Optional[str] = None):
+    """One-shot copy of data/*.json into the SQLite store. Safe to re-run."""
+    # Reading through the log storage also picks up anything not yet compacted
+    source = JsonLogStorage(data_dir)
+    target = SQLiteStorage(db_path or os.path.join(data_dir, "kala_kaksh.db"))
+
+    artisans = source.load_artisans()
+    products = source.load_products()
+    target.save_artisans(artisans)
+    target.save_products(products)
+
+    return {'artisans': len(artisans), 'products': len(products), 'db_path': target.db_path}
+
+if __name__ == '__main__':
+    from config import Config
+
+    result = migrate_json_to_sqlite(Config.DATA_DIR, Config.SQLITE_PATH)
+    print(f"Migrated {result['artisans']} artisans and {result['products']} products "
+          f"into {result['db_path']}")
@@ -0,0 +1,103 @@
+import os
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+from utils.helpers import FileLock
+
+class ThumbnailCache:
+    """Size-bounded, least-recently-used disk cache for rendered images.
+
+    get(name, render) returns the path of the cached file, calling
+    render(tmp_path) to create it on a miss. Renders are coalesced: a
+    miss takes one of a fixed set of lock stripes (flock files, so this
+    holds across worker processes too), and callers that queued behind it
+    find the file already there instead of rendering it again.
+
+    Recency is kept in memory and mirrored in file mtimes, so the order
+    survives restarts. Once the total size passes max_bytes the oldest
+    files are deleted. Each process enforces the bound on its own view;
+    a file another process removed is simply rendered again.
+    """
+
+    STRIPES = 64
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        # Absolute, since Flask resolves relative send_file paths against the app root
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stripes = [FileLock(os.path.join(self.cache_dir, ".locks", f"{n}.lock"))
+                         for n in range(self.STRIPES)]
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self._scan()
+
+    def _scan(self):
+        """Pick up what earlier runs left on disk, oldest first"""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.startswith('.'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total_bytes += size
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def get(self, name: str, render: Callable[[str], None]) -> str:
+        path = self.path_for(name)
+        if self._hit(name, path):
+            return path
+
+        with self._stripes[zlib.crc32(name.encode('utf-8')) % self.STRIPES]:
+            # Whoever held the stripe before us may have rendered it already
+            if self._hit(name, path):
+                return path
+
+            tmp_path = os.path.join(self.cache_dir, f".{name}.{os.getpid()}.tmp")
+            try:
+                render(tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            self._add(name, os.path.getsize(path))
+        return path
+
+    def _hit(self, name: str, path: str) -> bool:
+        try:
+            os.utime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.total_bytes -= self.entries.pop(name, 0)
+            return False
+
+        with self._lock:
+            if name in self.entries:
+                self.entries.move_to_end(name)
+            else:
+                # Rendered by another process
+                self.entries[name] = size
+                self.total_bytes += size
+        return True
+
+    def _add(self, name: str, size: int):
+        with self._lock:
+            self.total_bytes += size - self.entries.pop(name, 0)
+            self.entries[name] = size
+
+            # Never evict the file that was just rendered
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_name, old_size = self.entries.popitem(last=False)
+                self.total_bytes -= old_size
+                try:
+                    os.remove(self.path_for(old_name))
+                except FileNotFoundError:
+                    pass
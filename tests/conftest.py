@@ -0,0 +1,27 @@
+import os
+import sys
+import shutil
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The Flask app module, running on a copy of data/ in a scratch directory"""
+    root = tmp_path_factory.mktemp('kala_kaksh')
+    for name in ('artisans.json', 'products.json'):
+        os.makedirs(root / 'data', exist_ok=True)
+        shutil.copy(os.path.join(REPO, 'data', name), root / 'data' / name)
+
+    # Image jobs run inline, so a request's job has finished when it returns
+    os.environ['IMAGE_WORKERS'] = '0'
+    cwd = os.getcwd()
+    os.chdir(root)
+    import app
+    yield app
+    os.chdir(cwd)
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
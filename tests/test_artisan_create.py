@@ -0,0 +1,16 @@
+import pytest
+
+ARTISAN = {'name': 'Meera Devi', 'phone': '9876500000', 'craft_type': 'Madhubani', 'location': 'Bihar'}
+
+@pytest.mark.parametrize('email', [None, 42, ['a@b.in'], {'to': 'a@b.in'}, '', '   '])
+def test_create_rejects_email_that_is_not_a_non_empty_string(client, email):
+    response = client.post('/api/artisans', json={**ARTISAN, 'email': email})
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'email must be a non-empty string'
+
+def test_create_checks_the_trimmed_email(app_module, client):
+    existing = app_module.data.get_all_artisans()[0].email
+    response = client.post('/api/artisans', json={**ARTISAN, 'email': f'  {existing.upper()} '})
+
+    assert response.status_code == 409
@@ -0,0 +1,20 @@
+def test_update_keeps_product_count_bumped_between_read_and_write(app_module, client, monkeypatch):
+    data = app_module.data
+    artisan = data.get_all_artisans()[0]
+    read = data.get_artisan_by_id
+
+    def get_artisan_by_id(artisan_id):
+        found = read(artisan_id)
+        # create_product bumping total_products right after the route's read
+        bumped = read(artisan_id)
+        bumped.increment_products()
+        data.update_artisan(bumped)
+        return found
+
+    monkeypatch.setattr(data, 'get_artisan_by_id', get_artisan_by_id)
+    response = client.put(f'/api/artisans/{artisan.id}', json={'bio': 'Third generation potter'})
+
+    assert response.status_code == 200
+    stored = read(artisan.id)
+    assert stored.bio == 'Third generation potter'
+    assert stored.total_products == artisan.total_products + 1
@@ -0,0 +1,61 @@
+def _pending(product):
+    return [i for i in product.images if isinstance(i, dict) and i.get('status') == 'pending']
+
+def _resolve_after_read(data, monkeypatch, job_id, image):
+    """Make the image job finish right after the route has read the product"""
+    read = data.get_product_by_id
+
+    def get_product_by_id(product_id):
+        product = read(product_id)
+        data.resolve_product_image(product_id, job_id, image)
+        return product
+
+    monkeypatch.setattr(data, 'get_product_by_id', get_product_by_id)
+    return read
+
+def test_update_keeps_image_resolved_between_read_and_write(app_module, client, monkeypatch):
+    data = app_module.data
+    product = data.get_all_products()[0]
+    data.add_pending_product_image(product.id, 'job-put', '/uploads/preview.jpg')
+    image = {'url': '/uploads/images/put.webp'}
+    read = _resolve_after_read(data, monkeypatch, 'job-put', image)
+
+    response = client.put(f'/api/products/{product.id}', json={'name': 'Renamed vase'})
+
+    assert response.status_code == 200
+    stored = read(product.id)
+    assert stored.name == 'Renamed vase'
+    assert image in stored.images
+    assert not _pending(stored)
+
+def test_bulk_update_keeps_image_resolved_between_read_and_write(app_module, client, monkeypatch):
+    data = app_module.data
+    product = data.get_all_products()[1]
+    data.add_pending_product_image(product.id, 'job-bulk', '/uploads/preview.jpg')
+    image = {'url': '/uploads/images/bulk.webp'}
+    read = _resolve_after_read(data, monkeypatch, 'job-bulk', image)
+
+    response = client.post('/api/products/bulk', json=[{'id': product.id, 'price': 1234}])
+
+    assert response.status_code == 200
+    assert response.json['updated'] == 1
+    stored = read(product.id)
+    assert stored.price == 1234.0
+    assert image in stored.images
+    assert not _pending(stored)
+
+def test_bulk_rejects_second_row_with_same_id(app_module, client):
+    data = app_module.data
+    product = data.get_all_products()[2]
+
+    response = client.post('/api/products/bulk', json=[
+        {'id': product.id, 'price': 250},
+        {'id': product.id, 'price': 999, 'name': 'Overwritten'},
+    ])
+
+    assert response.status_code == 200
+    assert response.json['updated'] == 1
+    assert response.json['errors'] == [{'row': 1, 'error': 'Duplicate id in batch (first in row 0)'}]
+    stored = data.get_product_by_id(product.id)
+    assert stored.price == 250.0
+    assert stored.name == product.name
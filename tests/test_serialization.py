@@ -0,0 +1,33 @@
+import pytest
+from flask import Flask, request
+
+from utils import serialization
+
+@pytest.fixture(params=sorted(serialization.BACKENDS))
+def backend(request):
+    previous = serialization.backend
+    yield serialization.use(request.param)
+    serialization.use(previous)
+
+def test_round_trip(backend):
+    row = {'id': 'p1', 'name': 'Kundan earrings', 'price': 4999.0, 'tags': ['gold', 'pearl']}
+    assert serialization.loads(serialization.dumps(row)) == row
+    assert serialization.loads(serialization.dumps(row, pretty=True)) == row
+
+def test_decode_error_is_a_value_error(backend):
+    with pytest.raises(serialization.DecodeError) as info:
+        serialization.loads(b'{"id": ')
+    assert isinstance(info.value, ValueError)
+
+def test_bad_request_body_is_a_400(backend):
+    app = Flask(__name__)
+    app.json = serialization.JSONProvider(app)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return request.get_json()
+
+    client = app.test_client()
+    response = client.post('/echo', data=b'{"id": ', content_type='application/json')
+    assert response.status_code == 400
+    assert client.post('/echo', json={'id': 'a1'}).json == {'id': 'a1'}
@@ -0,0 +1,23 @@
+"""Negotiated response compression: brotli when installed, otherwise gzip."""
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first when a client accepts several at the same quality
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate(accept_encodings) -> Optional[str]:
+    """Best encoding we support from a request's Accept-Encoding, or None"""
+    return accept_encodings.best_match(ENCODINGS)
+
+def compress(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    if encoding == 'gzip':
+        # Fixed mtime so identical bodies always compress to identical bytes
+        return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+    raise ValueError(f'Unsupported encoding: {encoding}')
@@ -1,8 +1,17 @@
 import os
 import uuid
-import json
+import base64
+import tempfile
+import threading
+from bisect import bisect_right
 from datetime import datetime
 from werkzeug.utils import secure_filename
+from utils import serialization
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: fall back to in-process locking only
+    fcntl = None
 
 # ID generation
 def generate_id():
@@ -38,13 +47,34 @@ def allowed_file(filename, allowed_extensions=None):
     return ext in allowed_extensions
 
 # JSON handling
-def save_json_data(data, filepath):
-    """Save data to a JSON file with error handling"""
+def atomic_write(filepath, write, binary=False):
+    """Write a file via temp file + fsync + rename so readers never see half of it"""
+    directory = os.path.dirname(filepath) or '.'
+    os.makedirs(directory, exist_ok=True)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(filepath) + '.')
     try:
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        try:
+            mode = os.stat(filepath).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
         
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+        with os.fdopen(fd, 'wb' if binary else 'w') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_json_data(data, filepath, pretty=True):
+    """Save data to a JSON file with error handling (indented unless pretty=False)"""
+    try:
+        encoded = serialization.dumps(data, pretty=pretty)
+        atomic_write(filepath, lambda f: f.write(encoded), binary=True)
         return True
     except Exception as e:
         print(f"Error saving JSON data: {e}")
@@ -53,18 +83,80 @@ def save_json_data(data, filepath):
 def load_json_data(filepath):
     """Load data from a JSON file"""
     try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        with open(filepath, 'rb') as f:
+            return serialization.loads(f.read())
     except FileNotFoundError:
 
         return []
-    except json.JSONDecodeError:
+    except serialization.DecodeError:
         print(f"Warning: Couldn't parse JSON in {filepath}")
         return []
     except Exception as e:
         print(f"Error loading JSON data: {e}")
         return []
 
+# Pagination
+def encode_cursor(key):
+    """Opaque, URL-safe cursor for a sort key tuple"""
+    raw = serialization.dumps(list(key))
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _cursor_value_ok(value, expected):
+    if expected is float:
+        # JSON may bring a whole number back as an int; bools never count
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+def decode_cursor(cursor, types=None):
+    """Turn a cursor back into its sort key; raises ValueError if it's garbage.
+    
+    With types, the key must hold exactly one value of each, in order, so
+    it can't fail to compare against the real keys it is looked up among.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = serialization.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, list):
+        raise ValueError('Invalid cursor')
+    if types is not None and (len(key) != len(types)
+                              or not all(map(_cursor_value_ok, key, types))):
+        raise ValueError('Invalid cursor')
+    return tuple(key)
+
+def paginate(items, limit, cursor=None, key=lambda item: (item.created_at, item.id),
+             key_types=(str, str)):
+    """Return (page, next_cursor) for items ordered by key, starting after cursor.
+    
+    The default key (created_at, id) is unique, so pages stay stable when new
+    records arrive while a client is paging. key_types are the types of the
+    key's values, which a cursor must match (ValueError otherwise).
+    """
+    keyed = sorted(((key(item), item) for item in items), key=lambda pair: pair[0])
+    
+    start = 0
+    if cursor:
+        after = decode_cursor(cursor, key_types)
+        start = bisect_right([k for k, _ in keyed], after)
+    
+    page = keyed[start:start + limit]
+    next_cursor = None
+    if start + limit < len(keyed) and page:
+        next_cursor = encode_cursor(page[-1][0])
+    return [item for _, item in page], next_cursor
+
+def parse_fields(fields_param, allowed):
+    """Split a ?fields=a,b,c value, always keeping 'id'. None means every field."""
+    if not fields_param:
+        return None
+    
+    fields = ['id'] + [f.strip() for f in fields_param.split(',') if f.strip() and f.strip() != 'id']
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
 def format_currency(amount):
     """Format a price with Indian Rupee symbol"""
     if amount is None:
@@ -111,4 +203,69 @@ def create_backup(filepath):
             return True
         except Exception as e:
             print(f"Backup failed: {e}")
-    return False
\ No newline at end of file
+    return False
+
+# Cross-process coordination
+class FileLock:
+    """Exclusive lock shared by every worker process through flock() on a file.
+
+    Re-entrant within a process, so code already holding the lock can call
+    helpers that take it again.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+    
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl:
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._file = open(self.path, 'a+')
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+    
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._file:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+    
+    # A lock sent to another process (e.g. an image worker) arrives unlocked
+    def __getstate__(self):
+        return {'path': self.path}
+    
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+def read_generation(filepath):
+    """Current value of a shared generation counter (0 if it was never bumped)"""
+    try:
+        with open(filepath, 'r') as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def bump_generation(filepath):
+    """Increment a shared generation counter; call while holding the matching FileLock"""
+    generation = read_generation(filepath) + 1
+    atomic_write(filepath, lambda f: f.write(str(generation)))
+    return generation
@@ -0,0 +1,107 @@
+"""JSON encoding through the fastest library available.
+
+orjson is used when installed, then msgspec, then the standard library;
+``use()`` picks one explicitly. Every backend takes and returns the same
+plain dicts/lists, encodes to UTF-8 bytes and is compact unless pretty=True.
+"""
+import json
+from typing import Any, Callable, Optional
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Stdlib
+def _json_dumps(obj, pretty, default):
+    if pretty:
+        text = json.dumps(obj, default=default, ensure_ascii=False, indent=2)
+    else:
+        text = json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':'))
+    return text.encode('utf-8')
+
+BACKENDS = {'json': (_json_dumps, json.loads, json.JSONDecodeError)}
+
+if orjson is not None:
+    def _orjson_dumps(obj, pretty, default):
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option)
+
+    BACKENDS['orjson'] = (_orjson_dumps, orjson.loads, orjson.JSONDecodeError)
+
+if msgspec is not None:
+    def _msgspec_dumps(obj, pretty, default):
+        data = msgspec.json.encode(obj, enc_hook=default)
+        return msgspec.json.format(data, indent=2) if pretty else data
+
+    class MsgspecDecodeError(msgspec.DecodeError, ValueError):
+        """msgspec.DecodeError that is also a ValueError, as the other
+        backends' errors are, so Flask turns a bad request body into a 400"""
+
+    def _msgspec_loads(data):
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as e:
+            raise MsgspecDecodeError(*e.args) from None
+
+    BACKENDS['msgspec'] = (_msgspec_dumps, _msgspec_loads, MsgspecDecodeError)
+
+PREFERENCE = ('orjson', 'msgspec', 'json')
+
+# Whatever backend is in use, a parse error is one of these, all ValueErrors
+# (msgspec's own DecodeError isn't, hence the subclass above); the stdlib
+# raises UnicodeDecodeError itself for bytes that aren't UTF-8
+DecodeError = (UnicodeDecodeError,) + tuple(error for _, _, error in BACKENDS.values())
+
+backend = None
+_dumps = _loads = None
+
+def use(name: Optional[str] = None) -> str:
+    """Switch backend; None picks the first installed one in PREFERENCE"""
+    global backend, _dumps, _loads
+    if name is None:
+        name = next(n for n in PREFERENCE if n in BACKENDS)
+    elif name not in BACKENDS:
+        raise ValueError(f"JSON backend '{name}' is not available "
+                         f"(installed: {', '.join(BACKENDS)})")
+    backend = name
+    _dumps, _loads = BACKENDS[name][:2]
+    return name
+
+use()
+
+def dumps(obj: Any, pretty: bool = False, default: Optional[Callable] = None) -> bytes:
+    """Encode to UTF-8 JSON; compact unless pretty (2-space indent)"""
+    return _dumps(obj, pretty, default)
+
+def loads(data) -> Any:
+    """Decode JSON from bytes or str"""
+    return _loads(data)
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with the selected backend.
+
+    jsonify() responses are always compact and built straight from the
+    encoded bytes. Types the backend can't handle (dates, UUIDs...) go
+    through Flask's usual default hook.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, default=self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, default=self.default) + b'\n',
+                                        mimetype=self.mimetype)